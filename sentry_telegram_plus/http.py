@@ -0,0 +1,54 @@
+# coding: utf-8
+"""
+Переиспользуемые HTTP-сессии для запросов к Telegram Bot API.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Число потоков общего пула отправки сообщений.
+SEND_MAX_WORKERS = 16
+# Сколько отправитель ждет завершения параллельных отправок одного события.
+SEND_WAIT_TIMEOUT = 60
+
+# Размер пула соединений на origin: не меньше числа потоков, параллельно отправляющих сообщения,
+# иначе лишние соединения закрываются после каждого запроса (по умолчанию в пуле 10 соединений).
+POOL_MAXSIZE = 16
+
+# Повторяются только ошибки установки соединения: запрос еще не отправлен, и сообщение не задвоится.
+CONNECT_RETRIES = Retry(total=2, connect=2, read=0, redirect=0, status=0, other=0, backoff_factor=0.1)
+
+# Общий пул потоков для отправки плагина и интеграции: потоки не создаются заново на каждое событие.
+send_executor = ThreadPoolExecutor(max_workers=SEND_MAX_WORKERS, thread_name_prefix="telegram-send")
+
+_sessions: Dict[Tuple[str, str], Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str) -> Session:
+    """
+    Возвращает постоянную сессию для origin (схема + хост) указанного URL, чтобы соединения
+    и TLS-рукопожатия переиспользовались между сообщениями.
+    Сессия создается через sentry.http.build_session и сохраняет его защиту от SSRF.
+    """
+    origin = urlsplit(url)[:2]
+    session = _sessions.get(origin)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(origin)
+            if session is None:
+                from sentry.http import build_session
+
+                session = build_session()
+                for adapter in session.adapters.values():
+                    # Адаптеры Sentry переопределяют init_poolmanager, поэтому пул пересоздается с той же защитой.
+                    if isinstance(adapter, HTTPAdapter):
+                        adapter.init_poolmanager(1, POOL_MAXSIZE)
+                        adapter.max_retries = CONNECT_RETRIES
+                _sessions[origin] = session
+    return session
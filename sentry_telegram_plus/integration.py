@@ -3,10 +3,16 @@ from __future__ import annotations
 import logging
 import json
 import re
-from collections.abc import Mapping, Sequence
-from typing import Any, NamedTuple, TypedDict, Literal
+import string
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import wait
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING, Any, NamedTuple, TypedDict
 
 from django import forms
+from django.http import HttpResponse
 from django.http.request import HttpRequest
 from django.utils.translation import gettext_lazy as _
 
@@ -17,20 +23,333 @@ from sentry.integrations.base import (
     IntegrationMetadata,
     IntegrationProvider,
 )
-from sentry.integrations.models.integration import Integration
 from sentry.integrations.messaging.integration import MessagingIntegration
-from sentry.shared_integrations.exceptions import IntegrationError
-from sentry.http import safe_urlopen
-from sentry.models.group import Group
-from sentry.event_manager import Event
-from sentry.types.integrations import ExternalProviders
-from sentry.types.alert import Alert, AlertCategory
+from sentry.integrations.pipeline_types import IntegrationPipelineT, IntegrationPipelineViewT
 from sentry.notifications.notification_options import NotificationSetting, NotificationOption
 
+from .http import SEND_WAIT_TIMEOUT, get_session, send_executor
+from .patterns import LiteralPattern, compile_pattern
+from .serialization import dumps as _dumps, loads as _loads
+
+if TYPE_CHECKING:
+    from sentry.event_manager import Event
+    from sentry.types.alert import Alert
+
 logger = logging.getLogger("sentry.integrations.telegram_routing")
 
 TELEGRAM_MAX_MESSAGE_LENGTH = 4096
 EVENT_TITLE_MAX_LENGTH = 500
+SEND_TIMEOUT = 30
+
+# Символы, которые нужно экранировать в Markdown v1
+# https://core.telegram.org/bots/api#markdown-style
+_MARKDOWN_V1_ESCAPE = str.maketrans({char: "\\" + char for char in "_*`["})
+_REFERRER_QUERY = "referrer=telegram_routing_plus-integration"
+
+# Сообщения, уже отправленные по последним событиям. Sentry вызывает send_message отдельно для каждого
+# канала и обычно на новом экземпляре интеграции, поэтому учет ведется на уровне модуля.
+_RECENT_SENDS_MAX_EVENTS = 256
+_recent_sends: OrderedDict[str, set[tuple[str, str, int]]] = OrderedDict()
+_recent_sends_lock = threading.Lock()
+
+
+class _SafeContext(dict):
+    """Контекст шаблона, возвращающий [NA] для неизвестных имен."""
+
+    __slots__ = ()
+
+    def __missing__(self, key):
+        return "[NA]"
+
+
+def _event_tags(event: Event) -> Mapping[str, str]:
+    """Теги события в виде словаря."""
+    return event.tags if isinstance(event.tags, Mapping) else dict(event.tags)
+
+
+class _LazyTagDict:
+    """
+    Теги события для шаблона. Словарь тегов собирается _EventView только при первом обращении.
+    """
+
+    __slots__ = ("_view",)
+
+    def __init__(self, view: _EventView):
+        self._view = view
+
+    def __getitem__(self, key: str) -> str:
+        return self._view.tags.get(key, "[NA]")
+
+
+class _SafeFormatter(string.Formatter):
+    """Форматтер, подставляющий [NA] вместо полей, которых нет в контексте."""
+
+    def get_field(self, field_name, args, kwargs):
+        try:
+            return super().get_field(field_name, args, kwargs)
+        except (KeyError, IndexError, AttributeError, TypeError):
+            return "[NA]", field_name
+
+
+_formatter = _SafeFormatter()
+
+
+def _field_key(key: str) -> int | str:
+    return int(key) if key.isdecimal() else key
+
+
+def _split_field_name(field_name: str) -> tuple[int | str, tuple[tuple[bool, int | str], ...]]:
+    """
+    Разбирает имя поля шаблона, например tag[level] или event.project.slug, на первое имя
+    и путь доступа ((is_attr, key), ...) по тем же правилам, что и str.format.
+    """
+    end = len(field_name)
+    for index, char in enumerate(field_name):
+        if char in ".[":
+            end = index
+            break
+    rest = []
+    index = end
+    while index < len(field_name):
+        if field_name[index] == ".":
+            start = index + 1
+            index = start
+            while index < len(field_name) and field_name[index] not in ".[":
+                index += 1
+            if index == start:
+                raise ValueError("Empty attribute in format string")
+            rest.append((True, field_name[start:index]))
+        else:
+            start = index + 1
+            index = field_name.find("]", start)
+            if index == -1:
+                raise ValueError("Missing ']' in format string")
+            if index == start:
+                raise ValueError("Empty attribute in format string")
+            rest.append((False, _field_key(field_name[start:index])))
+            index += 1
+            if index < len(field_name) and field_name[index] not in ".[":
+                raise ValueError("Only '.' or '[' may follow ']' in format field specifier")
+    return _field_key(field_name[:end]), tuple(rest)
+
+
+@lru_cache(maxsize=256)
+def _compile_template(template: str) -> Callable[[Mapping[str, Any]], str]:
+    """
+    Разбирает шаблон один раз и возвращает функцию его отрисовки.
+    Шаблоны без полей отрисовываются заранее.
+    """
+    fields = list(_formatter.parse(template))
+    if all(field_name is None for _literal, field_name, _spec, _conversion in fields):
+        rendered = "".join(literal for literal, _field_name, _spec, _conversion in fields)
+        return lambda context: rendered
+    if any(format_spec and "{" in format_spec for _literal, _field_name, format_spec, _conversion in fields):
+        # Вложенные поля в спецификации формата оставляем на откуп Formatter.vformat.
+        return lambda context: _formatter.vformat(template, (), context)
+
+    # Имена полей вида tag[level] разбираются на ключ и путь доступа заранее,
+    # а не при каждой отрисовке, как это делает str.format_map.
+    # Поля {tag[X]} помечаются отдельно и берутся напрямую из тегов по ключу X.
+    segments = []
+    for literal, field_name, format_spec, conversion in fields:
+        if field_name is None:
+            segments.append((literal, None, (), None, "", None))
+            continue
+        first, rest = _split_field_name(field_name)
+        tag_key = rest[0][1] if first == "tag" and len(rest) == 1 and not rest[0][0] else None
+        segments.append((literal, first, rest, conversion, format_spec, tag_key))
+    segments = tuple(segments)
+
+    def render(context: Mapping[str, Any]) -> str:
+        tags = context.get("tag")
+        parts = []
+        for literal, first, rest, conversion, format_spec, tag_key in segments:
+            parts.append(literal)
+            if first is None:
+                continue
+            try:
+                if tag_key is not None:
+                    value = tags[tag_key]
+                else:
+                    value = context[first]
+                    for is_attr, key in rest:
+                        value = getattr(value, key) if is_attr else value[key]
+            except (KeyError, IndexError, AttributeError, TypeError):
+                value = "[NA]"
+            value = _formatter.convert_field(value, conversion)
+            parts.append(_formatter.format_field(value, format_spec))
+        return "".join(parts)
+
+    return render
+
+
+def _event_url(event: Event) -> str:
+    """Ссылка на событие с referrer интеграции."""
+    base_url = event.get_absolute_url()
+    return f"{base_url}{'&' if '?' in base_url else '?'}{_REFERRER_QUERY}"
+
+
+def _claim_receivers(event: Event | None, url: str, message_text: str, receivers: Sequence[str]) -> tuple[str, ...]:
+    """
+    Возвращает получателей, которым это сообщение о событии еще не отправлялось тем же ботом.
+    Чат, входящий в несколько подходящих каналов с одним API токеном, получает одно сообщение, а не по одному на канал.
+    """
+    event_id = getattr(event, "event_id", None)
+    if event_id is None:
+        return tuple(receivers)
+    message_hash = hash(message_text)
+    claimed = []
+    with _recent_sends_lock:
+        sent = _recent_sends.get(event_id)
+        if sent is None:
+            sent = _recent_sends[event_id] = set()
+            if len(_recent_sends) > _RECENT_SENDS_MAX_EVENTS:
+                _recent_sends.popitem(last=False)
+        for chat_id in receivers:
+            key = (url, chat_id, message_hash)
+            if key not in sent:
+                sent.add(key)
+                claimed.append(chat_id)
+    return tuple(claimed)
+
+
+def _split_receivers(receivers: str) -> tuple[str, ...]:
+    """Разбивает строку получателей на chat_id, отбрасывая пустые элементы."""
+    return tuple(chat_id for chat_id in (part.strip() for part in receivers.split(";")) if chat_id)
+
+
+class _EventView:
+    """
+    Поля события, нужные фильтрам и шаблону, прочитанные один раз на событие.
+    Создается на каждую отправку и передается всем ее этапам, чтобы не кэшировать значения на самом Event.
+    """
+
+    __slots__ = (
+        "_event", "message", "title", "level", "project_slug", "_tags", "_url", "_message_lower", "_title_lower",
+    )
+
+    def __init__(self, event: Event):
+        self._event = event
+        self.message: str = event.message or ""
+        self.title: str = event.title or ""
+        self.level: str | None = event.level
+        self.project_slug: str | None = event.project.slug if event.project else None
+        self._tags: Mapping[str, str] | None = None
+        self._url: str | None = None
+        self._message_lower: str | None = None
+        self._title_lower: str | None = None
+
+    @classmethod
+    def from_event(cls, event: Event) -> _EventView:
+        return cls(event)
+
+    @property
+    def tags(self) -> Mapping[str, str]:
+        """Теги события, собираются при первом обращении фильтра или шаблона."""
+        if self._tags is None:
+            self._tags = _event_tags(self._event)
+        return self._tags
+
+    @property
+    def url(self) -> str:
+        """
+        Ссылка на событие. Вычисляется один раз на событие, даже если оно отправляется в несколько каналов.
+        """
+        if self._url is None:
+            self._url = _event_url(self._event)
+        return self._url
+
+    @property
+    def message_lower(self) -> str:
+        """Сообщение в нижнем регистре для фильтров-подстрок, вычисляется один раз на событие."""
+        if self._message_lower is None:
+            self._message_lower = self.message.lower()
+        return self._message_lower
+
+    @property
+    def title_lower(self) -> str:
+        if self._title_lower is None:
+            self._title_lower = self.title.lower()
+        return self._title_lower
+
+
+def _filter_cost(filter_type: str) -> int:
+    """Грубая оценка стоимости проверки фильтра: дешевые сравнения раньше регулярных выражений."""
+    if filter_type in ("level", "project_slug"):
+        return 1
+    if filter_type.startswith("tag__"):
+        return 2
+    if filter_type == "regex__title":
+        return 3
+    return 4
+
+
+def _compile_filter(filter_type: str, filter_value: str) -> Callable[[_EventView], bool] | None:
+    """
+    Превращает описание фильтра в функцию-предикат над событием.
+    Возвращает None для неподдерживаемых типов фильтров.
+    """
+    if filter_type == "regex__message":
+        pattern = compile_pattern(filter_value)
+        if isinstance(pattern, LiteralPattern):
+            literal = pattern.literal
+            # Подстрока ищется в уже приведенном к нижнему регистру тексте, если он ASCII (см. LiteralPattern).
+            return lambda view: literal in view.message_lower if view.message.isascii() else pattern.search(view.message)
+        return lambda view: bool(pattern.search(view.message))
+    if filter_type == "regex__title":
+        pattern = compile_pattern(filter_value)
+        if isinstance(pattern, LiteralPattern):
+            literal = pattern.literal
+            return lambda view: literal in view.title_lower if view.title.isascii() else pattern.search(view.title)
+        return lambda view: bool(pattern.search(view.title))
+    if filter_type.startswith("tag__"):
+        tag_name = filter_type.split("__", 1)[1]
+        pattern = compile_pattern(filter_value)
+
+        def match_tag(view: _EventView) -> bool:
+            tag_value = view.tags.get(tag_name)
+            return tag_value is not None and bool(pattern.search(tag_value))
+
+        return match_tag
+    if filter_type == "level":
+        return lambda view: view.level == filter_value
+    if filter_type == "project_slug":
+        return lambda view: view.project_slug is None or view.project_slug == filter_value
+    return None
+
+
+def _compile_channel_filters(filters: Any) -> tuple[Callable[[_EventView], bool], ...]:
+    """
+    Компилирует фильтры канала, отсортированные от дешевых к дорогим.
+    Фильтры без типа или значения и неподдерживаемые типы пропускаются;
+    любой другой некорректный фильтр (в том числе ошибка в регулярном выражении) приводит к ValueError.
+    """
+    if not isinstance(filters, list):
+        raise ValueError("'filters' must be a list of filter objects.")
+    compiled_filters = []
+    for f in filters:
+        if not isinstance(f, dict):
+            raise ValueError(f"each filter must be an object, got {f!r}.")
+        filter_type = f.get("type")
+        filter_value = f.get("value")
+
+        if not filter_type or not filter_value:
+            continue
+        if not isinstance(filter_type, str) or not isinstance(filter_value, str):
+            raise ValueError(f"filter type and value must be strings, got {f!r}.")
+        try:
+            compiled_filter = _compile_filter(filter_type, filter_value)
+        except re.error as e:
+            raise ValueError(f"invalid regular expression {filter_value!r}: {e}")
+        if compiled_filter is None:
+            logger.warning("TelegramRoutingIntegration: Unsupported filter type: %s", filter_type)
+            continue
+        compiled_filters.append((_filter_cost(filter_type), compiled_filter))
+    # Фильтры объединяются по И, поэтому порядок не влияет на результат,
+    # но дешевые проверки чаще отсекают событие до регулярных выражений по сообщению.
+    compiled_filters.sort(key=lambda item: item[0])
+    return tuple(compiled_filter for _cost, compiled_filter in compiled_filters)
+
 
 class TelegramChannelConfig(TypedDict):
     api_token: str
@@ -42,6 +361,38 @@ class TelegramChannelsConfigJson(TypedDict):
     channels: list[TelegramChannelConfig]
     api_origin: str
 
+class _ParsedChannel(NamedTuple):
+    """
+    Канал, разобранный один раз при загрузке конфигурации.
+    filters равен None, если фильтры канала некорректны: такой канал не подходит ни под одно событие.
+    """
+    api_token: str | None
+    receivers_str: str
+    receivers: tuple[str, ...]
+    template: str | None
+    filters: tuple[Callable[[_EventView], bool], ...] | None
+    is_default: bool
+    filter_error: str | None = None
+
+def _validate_channels_config(config: Any) -> None:
+    """
+    Проверяет разобранный channels_config_json. Некорректная конфигурация приводит к ValueError.
+    Отклоняется только то, на чем падает _get_parsed_channels или что отключает канал (ошибка в фильтрах):
+    пустые api_token, receivers и template допустимы, как и раньше, - такие каналы пропускаются при отправке.
+    """
+    if not isinstance(config, dict) or not isinstance(config.get("channels"), list):
+        raise ValueError("Channels configuration must contain a 'channels' key with a list of channel objects.")
+    for index, channel in enumerate(config["channels"]):
+        if not isinstance(channel, dict):
+            raise ValueError(f"Channel #{index} must be a dictionary.")
+        receivers = channel.get("receivers")
+        if receivers and not isinstance(receivers, str):
+            raise ValueError(f"The 'receivers' of channel #{index} must be a string of chat ids separated by ';'.")
+        try:
+            _compile_channel_filters(channel.get("filters") or [])
+        except ValueError as e:
+            raise ValueError(f"Invalid filters in channel #{index}: {e}")
+
 class TelegramRoutingIntegrationConfigForm(forms.Form):
     """
     Форма для настройки интеграции в UI Sentry.
@@ -79,15 +430,15 @@ class TelegramRoutingIntegrationConfigForm(forms.Form):
         channels_config_json = cleaned_data.get("channels_config_json")
         if channels_config_json:
             try:
-                config: TelegramChannelsConfigJson = json.loads(channels_config_json)
-                if "channels" not in config or not isinstance(config["channels"], list):
-                    raise forms.ValidationError(
-                        _("Channels configuration must contain a 'channels' key with a list of channel objects.")
-                    )
+                _validate_channels_config(_loads(channels_config_json))
             except json.JSONDecodeError as e:
                 raise forms.ValidationError(
                     _("Invalid JSON in Channels Configuration: %s. Please check your syntax.") % e
                 )
+            except ValueError as e:
+                raise forms.ValidationError(
+                    _("Invalid Channels Configuration: %s") % e
+                )
         return cleaned_data
 
 class ExampleSetupView(IntegrationPipelineViewT):
@@ -98,16 +449,22 @@ class ExampleSetupView(IntegrationPipelineViewT):
             <p><input type="submit" value="Continue" /></p>
         </form>
     """
+    TEMPLATE_BYTES = TEMPLATE.encode("utf-8")
 
     def dispatch(self, request: HttpRequest, pipeline: IntegrationPipelineT) -> HttpResponse:
         if request.method == "POST":
             return pipeline.next_step()
-        return HttpResponse(self.TEMPLATE)
+        return HttpResponse(self.TEMPLATE_BYTES, content_type="text/html; charset=utf-8")
 
 
 class TelegramRoutingIntegration(MessagingIntegration):
     provider = "telegram_routing_plus"
 
+    @cached_property
+    def _config(self) -> dict[str, Any]:
+        """Настройки интеграции, прочитанные один раз на экземпляр."""
+        return self.get_config_data()
+
     def get_client(self, access_token: str | None = None) -> Any:
         raise NotImplementedError("Telegram API client is channel-specific.")
 
@@ -115,33 +472,31 @@ class TelegramRoutingIntegration(MessagingIntegration):
 
         return TelegramRoutingIntegrationConfigForm
 
-    def get_message_context(self, notification: Alert, event: Event | None) -> dict[str, Any]:
-
+    def get_message_context(
+        self, notification: Alert, event: Event | None, view: _EventView | None = None
+    ) -> dict[str, Any]:
+        """view - уже прочитанные поля события; без него создаются заново."""
         if event:
+            if view is None:
+                view = _EventView.from_event(event)
             project_name = event.project.slug if event.project else "unknown-project"
             title = event.title
             message = event.message or ""
-            url = event.get_absolute_url(
-                params={"referrer": f"telegram_routing_plus-integration"}
-            )
-            tags = {tag.key: tag.value for tag in event.tags}
+            url = view.url
+            tags = _LazyTagDict(view)
         else:
             project_name = notification.project.slug if notification.project else "unknown-project"
             title = notification.get_subject()
             message = notification.message or ""
             url = notification.url
-            tags = {}
-
-        class TagDict(dict):
-            def __getitem__(self, key):
-                return self.get(key, "[NA]")
+            tags = _SafeContext()
 
         context = {
             "project_name": project_name,
             "url": url,
-            "title": title,
-            "message": message,
-            "tag": TagDict(tags),
+            "title": (title or "").translate(_MARKDOWN_V1_ESCAPE),
+            "message": message.translate(_MARKDOWN_V1_ESCAPE),
+            "tag": tags,
             "event": event,
             "notification": notification
         }
@@ -150,29 +505,18 @@ class TelegramRoutingIntegration(MessagingIntegration):
 
     def _render_message(self, template: str, context: Mapping[str, Any]) -> str:
         try:
-            def safe_format(template_str, **kwargs):
-                class SafeDict(dict):
-                    def __missing__(self, key):
-                        return "NA"
-                return template_str.format_map(SafeDict(**kwargs))
-
-            rendered_message = template.format_map(defaultdict(lambda: '[NA]', context)) # Упрощено
-
-            def replace_tag_placeholders(match):
-                tag_name = match.group(1)
-                return context["tag"].get(tag_name, "[NA]")
-
-            rendered_message = re.sub(r'\{tag\[(.*?)\]\}', replace_tag_placeholders, rendered_message)
-
+            # {tag[...]} разрешаются тем же проходом через теги из контекста,
+            # отсутствующие поля заменяются на [NA] без копирования контекста.
+            rendered_message = _compile_template(template)(context)
 
             if len(rendered_message) > TELEGRAM_MAX_MESSAGE_LENGTH:
                 rendered_message = rendered_message[:TELEGRAM_MAX_MESSAGE_LENGTH - 3] + "..."
             return rendered_message
         except KeyError as e:
-            logger.error(f"TelegramRoutingIntegration: Missing key in template context: {e}")
+            logger.error("TelegramRoutingIntegration: Missing key in template context: %s", e)
             return f"Error rendering template: Missing data for {e}. Original message: {template}"
         except Exception as e:
-            logger.error(f"TelegramRoutingIntegration: Error rendering template: {e}")
+            logger.error("TelegramRoutingIntegration: Error rendering template: %s", e)
             return f"Error rendering template: {e}. Original message: {template}"
 
     def send_message(
@@ -182,45 +526,76 @@ class TelegramRoutingIntegration(MessagingIntegration):
         channel_id: str,
         config: dict[str, Any],
     ) -> None:
-        api_token = config.get("api_token")
-        receivers = config.get("receivers", "").split(";")
-        template = config.get("template", self.get_config_data().get("default_message_template"))
-        api_origin = self.get_config_data().get("api_origin", "https://api.telegram.org")
+        self._send_to_channel(notification, event, self._parse_channel(config))
 
-        if not api_token:
+    def _send_to_channel(
+        self, notification: Alert, event: Event, channel: _ParsedChannel, view: _EventView | None = None
+    ) -> None:
+        config = self._config
+        api_origin = config.get("api_origin", "https://api.telegram.org")
+
+        if not channel.api_token:
             logger.warning("TelegramRoutingIntegration: No API token configured for channel.")
             return
 
-        if not receivers:
+        if not channel.receivers:
             logger.warning("TelegramRoutingIntegration: No receivers configured for channel.")
             return
 
+        template = channel.template or config.get("default_message_template")
         if not template:
-            template = self.get_config_data().get("default_message_template")
-            if not template:
-                logger.error("TelegramRoutingIntegration: No message template found for channel or default.")
-                return
+            logger.error("TelegramRoutingIntegration: No message template found for channel or default.")
+            return
 
-        context = self.get_message_context(notification, event)
+        context = self.get_message_context(notification, event, view)
         message_text = self._render_message(template, context)
 
         headers = {"Content-Type": "application/json"}
-        for chat_id in receivers:
-            if not chat_id.strip():
-                continue
+        url = f"{api_origin}/bot{channel.api_token}/sendMessage"
+        receivers = _claim_receivers(event, url, message_text, channel.receivers)
+        if not receivers:
+            logger.debug("TelegramRoutingIntegration: Message already sent to all receivers of channel %s.",
+                         channel.receivers_str)
+            return
+        # Тело запроса отличается только chat_id: сериализуем общую часть один раз
+        # и подставляем chat_id на уровне байтов.
+        payload_suffix = _dumps({"text": message_text, "parse_mode": "Markdown"})[1:]
+        payloads = [
+            (chat_id, b'{"chat_id":' + _dumps(chat_id) + b"," + payload_suffix)
+            for chat_id in receivers
+        ]
+
+        if len(payloads) == 1:
+            self._send_payload(url, headers, *payloads[0])
+            return
 
-            payload = {
-                "chat_id": chat_id.strip(),
-                "text": message_text,
-                "parse_mode": "Markdown",
-            }
-            url = f"{api_origin}/bot{api_token}/sendMessage"
+        # Запросы к разным получателям независимы - отправляем их параллельно в общем пуле.
+        _done, not_done = wait(
+            [send_executor.submit(self._send_payload, url, headers, chat_id, data) for chat_id, data in payloads],
+            timeout=SEND_WAIT_TIMEOUT,
+        )
+        if not_done:
+            # Оставшиеся отправки не отменяются и завершатся в фоне.
+            logger.warning(
+                "TelegramRoutingIntegration: %s of %s Telegram messages are still being sent after %s seconds.",
+                len(not_done), len(payloads), SEND_WAIT_TIMEOUT,
+            )
 
-            try:
-                response = safe_urlopen(url, headers=headers, data=json.dumps(payload))
-                response.raise_for_status()
-            except Exception as e:
-                logger.error(f"TelegramRoutingIntegration: Failed to send message to chat_id {chat_id}: {e}")
+    def _send_payload(self, url: str, headers: dict[str, str], chat_id: str, data: bytes) -> None:
+        try:
+            response = get_session(url).post(
+                url, headers=headers, data=data, allow_redirects=False, timeout=SEND_TIMEOUT
+            )
+        except Exception as e:
+            logger.error("TelegramRoutingIntegration: Failed to send message to chat_id %s: %s", chat_id, e)
+            return
+
+        # Ошибку API разбираем по коду ответа, без построения исключения HTTPError.
+        if response.status_code >= 300:
+            logger.error(
+                "TelegramRoutingIntegration: Failed to send message to chat_id %s: status %s, body %r",
+                chat_id, response.status_code, response.content[:200],
+            )
 
     def get_notification_options(self, organization, user, integration_id) -> Sequence[NotificationOption]:
         return [
@@ -231,54 +606,74 @@ class TelegramRoutingIntegration(MessagingIntegration):
             )
         ]
 
+    def _parse_channel(self, config: TelegramChannelConfig) -> _ParsedChannel:
+        receivers_str = config.get("receivers") or ""
+        filter_error = None
+        try:
+            filters = _compile_channel_filters(config.get("filters") or [])
+        except ValueError as e:
+            # Ошибка в фильтрах одного канала не должна мешать остальным каналам получать события.
+            logger.warning(
+                "TelegramRoutingIntegration: Filters of channel %s are invalid, the channel will not receive events: %s",
+                receivers_str, e,
+            )
+            filters = None
+            filter_error = str(e)
+        return _ParsedChannel(
+            api_token=config.get("api_token"),
+            receivers_str=receivers_str,
+            receivers=_split_receivers(receivers_str),
+            template=config.get("template"),
+            filters=filters,
+            is_default=not config.get("filters"),
+            filter_error=filter_error,
+        )
+
+    def _get_parsed_channels(self) -> tuple[_ParsedChannel, ...]:
+        """
+        Возвращает разобранную конфигурацию каналов.
+        JSON парсится только при изменении channels_config_json, а не на каждое событие.
+        """
+        channels_config_json = self._config.get("channels_config_json", '{"channels":[]}')
+        version = hash(channels_config_json)
+        if getattr(self, "_parsed_channels_version", None) != version:
+            channels_config: TelegramChannelsConfigJson = _loads(channels_config_json)
+            channels = tuple(self._parse_channel(channel) for channel in channels_config.get("channels") or [])
+            self._parsed_channels = channels
+            # Каналы без фильтров принимают любое событие. Каналы с фильтрами упорядочены так,
+            # чтобы сначала проверялись самые дешевые - с наименьшим числом фильтров.
+            self._default_channels = tuple(channel for channel in channels if channel.is_default)
+            self._filtered_channels = tuple(sorted(
+                (channel for channel in channels if not channel.is_default and channel.filters is not None),
+                key=lambda channel: len(channel.filters),
+            ))
+            self._parsed_channels_version = version
+        return self._parsed_channels
+
     def should_notify(self, notification: Alert, event: Event) -> bool:
-        config_data = self.get_config_data()
-        channels_config: TelegramChannelsConfigJson = json.loads(config_data.get("channels_config_json", '{"channels":[]}'))
+        channels = self._get_parsed_channels()
 
-        if not channels_config.get("channels"):
+        if not channels:
             logger.debug("No Telegram channels configured.")
             return False
 
-        for channel in channels_config["channels"]:
-            channel_filters = channel.get("filters", [])
-            if not channel_filters:
-                logger.debug(f"Channel {channel.get('receivers')} has no filters, acts as default.")
-                return True
+        if self._default_channels:
+            logger.debug("Default Telegram channel (without filters) configured.")
+            return True
 
-            if self._channel_matches_filters(event, channel_filters):
-                logger.debug(f"Event matches filters for channel {channel.get('receivers')}.")
+        view = _EventView.from_event(event)
+        for channel in self._filtered_channels:
+            if self._channel_matches_filters(view, channel.filters):
+                logger.debug("Event matches filters for channel %s.", channel.receivers_str)
                 return True
 
         logger.debug("Event does not match any Telegram channel filters.")
         return False
 
-    def _channel_matches_filters(self, event: Event, filters: list[dict[str, Any]]) -> bool:
-        for f in filters:
-            filter_type = f.get("type")
-            filter_value = f.get("value")
-
-            if not filter_type or not filter_value:
-                continue
-            if filter_type == "regex__message":
-                message = event.message or ""
-                if not re.search(filter_value, message, re.IGNORECASE):
-                    return False
-            elif filter_type == "regex__title":
-                title = event.title
-                if not re.search(filter_value, title, re.IGNORECASE):
-                    return False
-            elif filter_type.startswith("tag__"):
-                tag_name = filter_type.split("__", 1)[1]
-                tag_value = event.tags.get(tag_name)
-                if tag_value is None or not re.search(filter_value, tag_value, re.IGNORECASE):
-                    return False
-            elif filter_type == "level":
-                if event.level != filter_value:
-                    return False
-            elif filter_type == "project_slug":
-                if event.project and event.project.slug != filter_value:
-                    return False
-        return True
+    def _channel_matches_filters(
+        self, view: _EventView, compiled_filters: tuple[Callable[[_EventView], bool], ...]
+    ) -> bool:
+        return all(f(view) for f in compiled_filters)
 
     def get_notification_settings_url(self):
         return None
@@ -313,6 +708,8 @@ class TelegramRoutingIntegrationProvider(IntegrationProvider):
 
 
     def build_integration(self, state: Mapping[str, Any]) -> IntegrationData:
+        # Конфигурация фильтров могла измениться - сбрасываем кэш скомпилированных выражений.
+        compile_pattern.cache_clear()
 
         config_form_data = state.get("form_data", {})
         return {
@@ -0,0 +1,118 @@
+# coding: utf-8
+"""
+Компиляция шаблонов фильтров по регулярным выражениям.
+Если установлен google-re2, в RE2 (поиск за линейное время без бэктрекинга) компилируются только выражения,
+которые RE2 и re гарантированно понимают одинаково (см. _RE2_UNSAFE_RE); остальные всегда компилирует re.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Pattern, Union
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Значение фильтра без этих символов - обычная подстрока, регулярное выражение для нее не нужно.
+_REGEX_METACHARACTERS_RE = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+# Конструкции, которые RE2 понимает иначе, чем re: `$` не совпадает перед завершающим переводом строки,
+# классы \d, \w, \s, \b только ASCII, обратных ссылок `\1` в RE2 нет, `[:alpha:]` - POSIX-класс,
+# `{,n}` - не квантификатор. Символы вне ASCII исключены, чтобы не сравнивать правила регистронезависимости.
+_RE2_UNSAFE_RE = re.compile(r"[^\x00-\x7f]|\$|\\[0-9A-Za-z]|\[:|\{,")
+
+
+class LiteralPattern:
+    """
+    Замена re.Pattern для ASCII-фильтров-подстрок: регистронезависимый поиск через `in`,
+    который заметно быстрее re.search с re.IGNORECASE.
+    Для ASCII-строк lower() совпадает с правилами re.IGNORECASE; текст с другими символами
+    (`ſ` совпадает с `s`, `K` - знак Кельвина - с `k`) проверяется регулярным выражением.
+    """
+
+    __slots__ = ("literal", "_regex")
+
+    def __init__(self, literal: str):
+        self.literal = literal.lower()
+        self._regex = re.compile(re.escape(literal), re.IGNORECASE)
+
+    def search(self, text: str) -> bool:
+        if not text.isascii():
+            return self._regex.search(text) is not None
+        return self.literal in text.lower()
+
+
+class LiteralSetPattern:
+    """
+    Замена re.Pattern для ASCII-фильтров вида `^(fatal|error)$`: значение целиком сравнивается
+    с набором допустимых строк проверкой вхождения в множество, без регулярного выражения.
+    Текст с символами вне ASCII, как и в LiteralPattern, проверяется регулярным выражением.
+    """
+
+    __slots__ = ("values", "_regex")
+
+    def __init__(self, values: Iterable[str]):
+        values = list(values)
+        self.values = frozenset(value.lower() for value in values)
+        self._regex = re.compile("^(?:%s)$" % "|".join(re.escape(value) for value in values), re.IGNORECASE)
+
+    def search(self, text: str) -> bool:
+        if not text.isascii():
+            return self._regex.search(text) is not None
+        value = text.lower()
+        # `$` совпадает и перед завершающим переводом строки.
+        return value in self.values or (value.endswith("\n") and value[:-1] in self.values)
+
+
+def _anchored_alternatives(pattern: str) -> Optional[List[str]]:
+    """
+    Возвращает варианты выражения `^a$`, `^(a|b)$` или `^(?:a|b)$`, если все они - обычные строки, иначе None.
+    """
+    if not pattern.startswith("^") or not pattern.endswith("$"):
+        return None
+    body = pattern[1:-1]
+    if body.startswith("(?:") and body.endswith(")"):
+        body = body[3:-1]
+    elif body.startswith("(") and body.endswith(")"):
+        body = body[1:-1]
+    elif "|" in body:
+        # `^a|b$` означает `(^a)|(b$)`, а не точное совпадение с одним из вариантов.
+        return None
+    alternatives = body.split("|")
+    if any(not alternative or _REGEX_METACHARACTERS_RE.search(alternative) for alternative in alternatives):
+        return None
+    return alternatives
+
+
+def _strip_wildcards(pattern: str) -> str:
+    while pattern.startswith(".*"):
+        pattern = pattern[2:]
+    while pattern.endswith(".*") and not pattern.endswith("\\.*"):
+        pattern = pattern[:-2]
+    return pattern
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern: str) -> Union[Pattern, LiteralPattern, LiteralSetPattern]:
+    """
+    Компилирует значение фильтра один раз на каждый уникальный паттерн.
+    Обрамляющие `.*` при поиске ничего не меняют, поэтому `.*error.*` тоже считается подстрокой.
+    Точное совпадение с одним из вариантов (`^(fatal|error)$`) проверяется по множеству.
+    Быстрые пути только для ASCII: для остальных символов lower() расходится с re.IGNORECASE (`Σ` и `ς`).
+    """
+    if pattern.isascii():
+        literal = _strip_wildcards(pattern)
+        if not _REGEX_METACHARACTERS_RE.search(literal):
+            return LiteralPattern(literal)
+        alternatives = _anchored_alternatives(pattern)
+        if alternatives is not None:
+            return LiteralSetPattern(alternatives)
+    # re компилирует выражение в любом случае: его ошибки - ошибки конфигурации и без RE2.
+    compiled = re.compile(pattern, re.IGNORECASE)
+    if re2 is not None and not _RE2_UNSAFE_RE.search(pattern):
+        try:
+            return re2.compile("(?i)" + pattern)
+        except re2.error:
+            # Lookaround, атомарные группы и флаги вроде (?x) RE2 не поддерживает - остается re.
+            pass
+    return compiled
@@ -2,26 +2,374 @@
 import json
 import logging
 import re
-from collections import defaultdict
-from typing import Any, Dict, List, Optional, TypedDict, Tuple
-from urllib.parse import urlparse
+from concurrent.futures import wait
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, TypedDict, Tuple, Union
 
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
-from sentry.http import safe_urlopen
 from sentry.plugins.bases import notify
 from sentry.utils.safe import safe_execute
 from sentry.utils.strings import truncatechars
 
 from . import __doc__ as package_doc
 from . import __version__
+from .http import SEND_WAIT_TIMEOUT, get_session, send_executor as _send_executor
+from .patterns import compile_pattern
+from .serialization import dumps, loads
 
 TELEGRAM_MAX_MESSAGE_LENGTH = 4096
 EVENT_TITLE_MAX_LENGTH = 500
+TRUNCATE_WARNING_TEXT = "... (truncated)"
+# Не содержит символов разметки, поэтому подставляется без экранирования.
+EMPTY_MESSAGE_TEXT = "пустое сообщение :("
+SEND_TIMEOUT = 30
+# Разобранные конфигурации каналов кэшируются по JSON строке, обычно одна запись на проект.
+# Запас по размеру нужен, чтобы при большом числе проектов фильтры не компилировались заново.
+CHANNELS_CONFIG_CACHE_SIZE = 1024
+
+_TRUNCATE_WARNING_LENGTH = len(TRUNCATE_WARNING_TEXT)
+
+# Символы, которые нужно экранировать в Markdown v1
+# https://core.telegram.org/bots/api#markdown-style
+_MARKDOWN_V1_ESCAPE = str.maketrans({char: "\\" + char for char in "_*`["})
+# Символы разметки Markdown (v1): без них текст отправляется без parse_mode и не разбирается Telegram.
+_MARKDOWN_V1_ENTITY_RE = re.compile(r"[_*`\[]")
+
+# Начало сущности Markdown v1 или экранирования: между ними при обрезке текста можно резать свободно.
+_MARKDOWN_V1_SPECIAL_RE = re.compile(r"[\\_*`\[]")
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Первое имя в поле шаблона: tag для {tag[level]}, event для {event.title}.
+_FIELD_NAME_FIRST_RE = re.compile(r"[^.\[]*")
+
+# Токен бота в URL Bot API: .../bot<token>/<method>
+_BOT_TOKEN_RE = re.compile(r"(/bot)[^/]+")
 
 logger = logging.getLogger("sentry.plugins.sentry_telegram_plus")
 
+_FilterPredicate = Callable[[Any, Dict[str, str]], bool]
+
+
+class _Channel(NamedTuple):
+    """
+    Канал, разобранный один раз при загрузке конфигурации.
+    parsed_receivers - разобранная строка получателей (см. _parse_receivers).
+    filters - предикаты фильтров (см. _compile_channel_filters): пустой кортеж у дефолтного канала,
+    None у канала, который не может совпасть ни с одним событием.
+    filter_error - почему фильтры канала не удалось разобрать (тогда filters - None).
+    """
+    api_token: Optional[str]
+    receivers: Optional[str]
+    parsed_receivers: Tuple[Tuple[str, ...], ...]
+    template: Optional[str]
+    api_origin: Optional[str]
+    filters: Optional[Tuple[_FilterPredicate, ...]]
+    send_url: Optional[str] = None
+    filter_error: Optional[str] = None
+
+
+@lru_cache(maxsize=256)
+def _build_send_url(api_origin: str, api_token: str) -> str:
+    return f"{api_origin}/bot{api_token}/sendMessage"
+
+
+def _freeze_channel(channel: "ChannelConfig", config_api_origin: Optional[str] = None) -> _Channel:
+    """
+    config_api_origin - api_origin из корня конфигурации каналов. Если origin канала известен при разборе,
+    URL отправки строится сразу; иначе он зависит от настроек проекта и строится при отправке.
+    """
+    filters = channel.get("filters")
+    receivers = channel.get("receivers")
+    api_token = channel.get("api_token")
+    api_origin = channel.get("api_origin")
+    origin = api_origin or config_api_origin
+    compiled_filters: Optional[Tuple[_FilterPredicate, ...]] = ()
+    filter_error = None
+    if filters:
+        try:
+            compiled_filters = _compile_channel_filters(filters)
+        except ValueError as e:
+            # Канал с некорректными фильтрами не получает событий, остальные каналы работают как обычно.
+            logger.warning("Channel filters are invalid, the channel will not receive events: %s", e)
+            compiled_filters, filter_error = None, str(e)
+    return _Channel(
+        api_token=api_token,
+        receivers=receivers,
+        parsed_receivers=_parse_receivers(receivers) if isinstance(receivers, str) and receivers else (),
+        template=channel.get("template"),
+        api_origin=api_origin,
+        filters=compiled_filters,
+        send_url=_build_send_url(origin, api_token) if origin and isinstance(api_token, str) and api_token else None,
+        filter_error=filter_error,
+    )
+
+
+class _ParsedChannels(tuple):
+    """
+    Каналы разобранной конфигурации. При разборе они один раз делятся на дефолтные (без фильтров)
+    и фильтруемые; каналы, которые не могут совпасть ни с одним событием, в разбиение не попадают.
+    """
+
+    def __new__(cls, channels):
+        self = super().__new__(cls, channels)
+        self.default_channels = tuple(channel for channel in self if channel.filters == ())
+        self.filtered_channels = tuple(channel for channel in self if channel.filters)
+        self.any_filters = len(self.default_channels) != len(self)
+        return self
+
+
+@lru_cache(maxsize=CHANNELS_CONFIG_CACHE_SIZE)
+def _parse_channels_config(config_json: str) -> Tuple["_ParsedChannels", Optional[str]]:
+    """
+    Парсит и проверяет channels_config_json, возвращает (каналы, api_origin из конфигурации).
+    Результат кэшируется по исходной строке, поэтому конфигурация не разбирается
+    и не проверяется заново на каждое событие. Каналы - неизменяемые _Channel, общие для всех вызовов.
+    Некорректная конфигурация приводит к ValueError.
+    """
+    config: ChannelsConfigJson = loads(config_json)
+
+    if not isinstance(config, dict):
+        raise ValueError("Channels configuration must be a dictionary.")
+    if "channels" not in config or not isinstance(config["channels"], list):
+        raise ValueError(
+            "Channels configuration must contain a 'channels' key with a list of channel objects."
+        )
+    if "api_origin" in config and not isinstance(config["api_origin"], str):
+        raise ValueError("The 'api_origin' in Channels Configuration must be a string.")
+
+    if not all(isinstance(channel, dict) for channel in config["channels"]):
+        raise ValueError("Each channel in Channels Configuration must be a dictionary.")
+
+    api_origin = config.get("api_origin")
+    return _ParsedChannels(_freeze_channel(channel, api_origin) for channel in config["channels"]), api_origin
+
+
+def _is_pattern_filter(filter_type: str) -> bool:
+    return filter_type in ("regex__message", "regex__title") or filter_type.startswith("tag__")
+
+
+def _compile_channel_filters(filters: List["ChannelFilter"]) -> Tuple["_FilterPredicate", ...]:
+    """
+    Превращает фильтры канала в предикаты predicate(event, tags) -> bool с уже скомпилированными
+    регулярными выражениями, чтобы на каждое событие не разбирать тип фильтра заново.
+    Некорректные фильтры (не список объектов, фильтр без строковых типа / значения, с неподдерживаемым типом
+    или некорректным регулярным выражением) приводят к ValueError; _freeze_channel превращает ее
+    в канал, который не совпадает ни с одним событием, поэтому разбор конфигурации не падает и кэшируется.
+    """
+    if not isinstance(filters, list):
+        raise ValueError("Channel filters must be a list of filter objects, got %s." % type(filters).__name__)
+    compiled_filters = []
+    for f in filters:
+        if not isinstance(f, dict):
+            raise ValueError("Channel filter must be an object, got %r." % (f,))
+        filter_type = f.get("type")
+        filter_value = f.get("value")
+        if not isinstance(filter_type, str) or not isinstance(filter_value, str):
+            raise ValueError("Filter 'type' and 'value' must be strings, got %r." % (f,))
+        if not filter_type or not filter_value:
+            raise ValueError("Filter 'type' and 'value' must not be empty, got %r." % (f,))
+        if _is_pattern_filter(filter_type):
+            try:
+                filter_value = compile_pattern(filter_value)
+            except re.error as e:
+                raise ValueError("Invalid regular expression %r in filter %s: %s." % (filter_value, filter_type, e))
+        predicate = _bind_filter(filter_type, filter_value)
+        if predicate is None:
+            raise ValueError("Unsupported filter type: %s." % filter_type)
+        compiled_filters.append((_filter_cost(filter_type), predicate))
+    # Фильтры объединяются по И, поэтому порядок не влияет на результат: дешевые проверки идут первыми.
+    compiled_filters.sort(key=lambda f: f[0])
+    return tuple(predicate for _cost, predicate in compiled_filters)
+
+
+def _bind_filter(filter_type: str, filter_value: Any) -> Optional["_FilterPredicate"]:
+    """Связывает обработчик типа фильтра с его значением. None - неподдерживаемый тип."""
+    matcher = _FILTER_MATCHERS.get(filter_type)
+    if matcher is not None:
+        return lambda event, tags: matcher(event, tags, filter_value)
+    if filter_type.startswith("tag__"):
+        tag_name = filter_type[len("tag__"):]
+        return lambda event, tags: _match_tag(event, tags, tag_name, filter_value)
+    return None
+
+
+def _filter_cost(filter_type: str) -> int:
+    """Грубая оценка стоимости проверки фильтра: дешевые сравнения раньше регулярных выражений."""
+    if filter_type in ("level", "project_slug"):
+        return 1
+    if filter_type == "value__tag" or filter_type.startswith("tag__"):
+        return 2
+    if filter_type == "regex__title":
+        return 3
+    return 4
+
+
+@lru_cache(maxsize=256)
+def _parse_receivers(receivers_str: str) -> Tuple[Tuple[str, ...], ...]:
+    """
+    Парсит строку получателей в кортежи (chat_id,) или (chat_id, message_thread_id).
+    Строка получателей берется из конфигурации, поэтому результат кэшируется.
+    """
+    # Частый случай - один чат без топика: обходимся без split / partition.
+    if ";" not in receivers_str and "/" not in receivers_str:
+        chat_id = receivers_str.strip()
+        return ((chat_id,),) if chat_id else ()
+
+    parsed_receivers = []
+    for part in receivers_str.split(";"):
+        chat_id, _separator, message_thread_id = part.partition("/")
+        chat_id = chat_id.strip()
+        message_thread_id = message_thread_id.strip()
+        if message_thread_id:
+            parsed_receivers.append((chat_id, message_thread_id))
+        elif chat_id:
+            parsed_receivers.append((chat_id,))
+    return tuple(parsed_receivers)
+
+
+@lru_cache(maxsize=256)
+def _receiver_json_prefix(receiver: Tuple[str, ...]) -> bytes:
+    """Начало JSON тела запроса с полями получателя, без закрывающей скобки: {"chat_id":...."""
+    prefix = b'{"chat_id":' + dumps(receiver[0])
+    if len(receiver) > 1:
+        prefix += b',"message_thread_id":' + dumps(receiver[1])
+    return prefix
+
+
+def _match_regex_message(event: Any, tags: Dict[str, str], pattern: Any) -> bool:
+    return bool(pattern.search(event.message or ""))
+
+
+def _match_regex_title(event: Any, tags: Dict[str, str], pattern: Any) -> bool:
+    return bool(pattern.search(event.title or ""))
+
+
+def _match_level(event: Any, tags: Dict[str, str], filter_value: str) -> bool:
+    return event.level == filter_value
+
+
+def _match_project_slug(event: Any, tags: Dict[str, str], filter_value: str) -> bool:
+    return bool(event.project and event.project.slug == filter_value)
+
+
+def _match_value_tag(event: Any, tags: Dict[str, str], filter_value: str) -> bool:
+    if isinstance(tags, _TagsDict):
+        return filter_value in tags.tag_values()
+    return filter_value in tags.values()
+
+
+def _match_tag(event: Any, tags: Dict[str, str], tag_name: str, pattern: Any) -> bool:
+    tag_value = tags.get(tag_name)
+    return bool(tag_value and pattern.search(tag_value))
+
+
+# Обработчики типов фильтров. Фильтры tag__<имя> обрабатываются отдельно через _match_tag.
+_FILTER_MATCHERS = {
+    "regex__message": _match_regex_message,
+    "regex__title": _match_regex_title,
+    "level": _match_level,
+    "project_slug": _match_project_slug,
+    "value__tag": _match_value_tag,
+}
+
+
+class _TagsDict(dict):
+    """Теги события. Отсутствующие теги подставляются в шаблон как [NA]."""
+
+    __slots__ = ("_values",)
+
+    def __missing__(self, key):
+        return "[NA]"
+
+    def tag_values(self) -> FrozenSet[str]:
+        """Множество значений тегов, собирается один раз для всех фильтров value__tag события."""
+        try:
+            return self._values
+        except AttributeError:
+            self._values = frozenset(self.values())
+            return self._values
+
+
+@lru_cache(maxsize=256)
+def _template_fields(message_template: str) -> FrozenSet[str]:
+    """Имена параметров верхнего уровня, на которые ссылается шаблон, например tag для {tag[level]}."""
+    fields = set()
+    for _literal, field_name, _spec, _conversion in Formatter().parse(message_template):
+        if field_name:
+            first = _FIELD_NAME_FIRST_RE.match(field_name).group()
+            # Числовые поля ({0}) - позиционные аргументы, а не параметры шаблона.
+            if not first.isdecimal():
+                fields.add(first)
+    return frozenset(fields)
+
+
+@lru_cache(maxsize=256)
+def _message_field_count(message_template: str) -> int:
+    """Сколько раз шаблон подставляет текст события: при обрезке каждая копия укорачивается на свою долю."""
+    return sum(
+        1
+        for _literal, field_name, _spec, _conversion in Formatter().parse(message_template)
+        if field_name and _FIELD_NAME_FIRST_RE.match(field_name).group() == "message"
+    )
+
+
+def _truncate_markdown_v1(text: str, length: int) -> str:
+    """
+    Обрезает текст с разметкой Markdown v1 до length символов, не разрывая экранирование (\\_)
+    и закрывая жирный, курсив, код или блок кода, оборванный на месте обрезки:
+    иначе Telegram отклоняет сообщение с ошибкой 400 и оно теряется. Оборванная ссылка отбрасывается целиком.
+    """
+    position = 0
+    while True:
+        match = _MARKDOWN_V1_SPECIAL_RE.search(text, position, length)
+        if match is None:
+            return text[:length]
+        start = match.start()
+        char = match.group()
+        if char == "\\":
+            if text[start + 1:start + 2] not in ("_", "*", "`", "["):
+                position = start + 1
+                continue
+            if start + 2 > length:
+                return text[:start]
+            position = start + 2
+            continue
+        if char == "[":
+            end = text.find("]", start + 1)
+            if end != -1 and text.startswith("(", end + 1):
+                end = text.find(")", end + 2)
+            if end == -1 or end + 1 > length:
+                return text[:start]
+            position = end + 1
+            continue
+        closer = "```" if text.startswith("```", start) else char
+        end = text.find(closer, start + len(closer))
+        if end != -1 and end + len(closer) <= length:
+            position = end + len(closer)
+            continue
+        # Сущность обрывается: сохраняем ее начало и закрываем ее в пределах length.
+        content = text[start + len(closer):length - len(closer)].rstrip("\\" + char)
+        if not content:
+            return text[:start]
+        return text[:start + len(closer)] + content + closer
+
+
+class _TemplateParams(dict):
+    """
+    Параметры шаблона сообщения. Отсутствующие ключи заменяются на '-'.
+    __missing__ нужен только для полей, которых нет в _template_fields (вложенные спецификации формата).
+    """
+
+    __slots__ = ()
+
+    def __missing__(self, key):
+        logger.warning("Missing key '%s' in message parameters for template. Replacing with '-'.", key)
+        return "-"
+
 
 class ChannelFilter(TypedDict):
     type: str
@@ -83,6 +431,25 @@ class TelegramNotificationsOptionsForm(notify.NotificationConfigurationForm):
             )
         return value
 
+    def clean_channels_config_json(self):
+        value = self.cleaned_data["channels_config_json"]
+        # Та же (кэшируемая) проверка, что и при отправке: первое событие после сохранения
+        # получит уже разобранную конфигурацию.
+        try:
+            channels = _parse_channels_config(value)[0]
+        except json.JSONDecodeError as e:
+            raise ValidationError(_("Invalid JSON in Channels Configuration: %(error)s"), params={"error": e})
+        except ValueError as e:
+            raise ValidationError(str(e))
+        # При отправке канал с некорректными фильтрами пропускается, а при сохранении это ошибка.
+        for index, channel in enumerate(channels):
+            if channel.filter_error:
+                raise ValidationError(
+                    _("Invalid filters in channel #%(index)s: %(error)s"),
+                    params={"index": index, "error": channel.filter_error},
+                )
+        return value
+
 
 class TelegramNotificationsPlugin(notify.NotificationPlugin):
     title = "Telegram Notifications Plus"
@@ -149,17 +516,15 @@ class TelegramNotificationsPlugin(notify.NotificationPlugin):
             },
         ]
 
-    def _escape_markdown_v1(self, text: str) -> str:
+    @staticmethod
+    def _escape_markdown_v1(text: str) -> str:
         """
         Экранирует специальные символы Markdown v1 для Telegram.
         Это необходимо, чтобы символы вроде *, _, `, [ отображались буквально,
         а не как форматирование, если они не предназначены для этого.
         """
-        # Символы, которые нужно экранировать в Markdown v1
-        # https://core.telegram.org/bots/api#markdown-style
-        special_chars = r'_*`['
-        escaped_text = "".join(['\\' + char if char in special_chars else char for char in text])
-        return escaped_text
+        return text.translate(_MARKDOWN_V1_ESCAPE)
+
 
     def compile_message_text(
             self, message_template: str, message_params: Dict[str, Any], event_message: str
@@ -167,231 +532,249 @@ class TelegramNotificationsPlugin(notify.NotificationPlugin):
         """
         Собирает текст сообщения из шаблона и данных события, обрезая его по длине, если необходимо.
         """
-        truncate_warning_text = "... (truncated)"
-
-        try:
-            max_message_body_len = TELEGRAM_MAX_MESSAGE_LENGTH - len(
-                message_template.format(**message_params, message=truncate_warning_text)
-            )
-        except KeyError as e:
-            missing_key = str(e).strip("'")
+        params = _TemplateParams(message_params, message=event_message)
+        # Отсутствующие в параметрах поля шаблона известны заранее и заполняются один раз.
+        missing_keys = _template_fields(message_template).difference(params)
+        if missing_keys:
             logger.warning(
-                f"Missing key '{missing_key}' in message parameters for template. "
+                "Missing keys %s in message parameters for template. Replacing with '-'.", sorted(missing_keys)
             )
-            temp_message_params = message_params.copy()
-            temp_message_params[missing_key] = "-"
-
-            max_message_body_len = TELEGRAM_MAX_MESSAGE_LENGTH - len(
-                message_template.format(**temp_message_params, message=truncate_warning_text)
-            )
-
-        if max_message_body_len < 0:
-            max_message_body_len = 0
+            params.update(dict.fromkeys(missing_keys, "-"))
+
+        # В обычном случае сообщение укладывается в лимит и шаблон форматируется один раз.
+        text = message_template.format_map(params)
+        if len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+            return text
+
+        if _message_field_count(message_template) and event_message:
+            # Длина шаблона, в котором каждая копия {message} содержит только предупреждение об обрезке.
+            params["message"] = TRUNCATE_WARNING_TEXT
+            base_length = len(message_template.format_map(params))
+            message = event_message
+            while message and base_length < TELEGRAM_MAX_MESSAGE_LENGTH:
+                params["message"] = message + TRUNCATE_WARNING_TEXT
+                text = message_template.format_map(params)
+                if len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+                    return text
+                # Сколько символов результата дает один символ события во всех копиях {message}:
+                # {message!r} и спецификации формата меняют длину, поэтому доля считается по готовому тексту.
+                growth = (len(text) - base_length) / len(message)
+                if growth <= 0:
+                    break
+                keep = min(int((TELEGRAM_MAX_MESSAGE_LENGTH - base_length) / growth), len(message) - 1)
+                # Обратный слэш на конце - половина экранирования, отрезанного от своего символа.
+                message = message[:keep].rstrip("\\")
 
-        if len(event_message) > max_message_body_len:
-            event_message = event_message[:max_message_body_len] + truncate_warning_text
+        # Лимит превышен не за счет текста события (длинный шаблон, спецификация формата): обрезаем результат.
+        return _truncate_markdown_v1(text, TELEGRAM_MAX_MESSAGE_LENGTH - _TRUNCATE_WARNING_LENGTH) + TRUNCATE_WARNING_TEXT
 
-        # Повторяем форматирование для окончательного текста
-        try:
-            final_text = message_template.format(**message_params, message=event_message)
-        except KeyError as e:
-            # Снова ловим, если KeyError возникнет при форматировании конечного сообщения
-            missing_key = str(e).strip("'")
-            logger.warning(
-                f"Missing key '{missing_key}' in message parameters for final template. "
-                "Replacing with '-' and retrying final message formatting."
+    def build_message(
+            self, group, event, message_template: str, tags: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Создание сообщения для отправки в Telegram.
+        tags - заранее собранный словарь тегов события.
+        """
+        if isinstance(tags, _TagsDict):
+            event_tags = tags
+        else:
+            event_tags = _TagsDict(tags if tags is not None else event.tags)
+
+        # Заголовок, текст события и ссылка готовятся, только если шаблон на них ссылается:
+        # экранирование длинного текста и построение ссылки (может обращаться к базе) - самое дорогое здесь.
+        template_fields = _template_fields(message_template)
+        escaped_event_message = ""
+        if "message" in template_fields:
+            escaped_event_message = (
+                self._escape_markdown_v1(event.message) if event.message else EMPTY_MESSAGE_TEXT
             )
-            temp_message_params = message_params.copy()
-            temp_message_params[missing_key] = "-"
-            final_text = message_template.format(**temp_message_params, message=event_message)
-
-        return final_text
-
-    def build_message(self, group, event, message_template: str) -> Dict[str, Any]:
-        """Создание сообщения для отправки в Telegram."""
-        event_tags = defaultdict(lambda: "[NA]")
-        event_tags.update({k: v for k, v in event.tags})
-
-        escaped_title = self._escape_markdown_v1(truncatechars(event.title, EVENT_TITLE_MAX_LENGTH))
-        escaped_event_message = self._escape_markdown_v1(event.message or "пустое сообщение :(")
 
         message_params = {
-            "title": escaped_title,
             "tag": event_tags,
             "project_name": group.project.name,
-            "url": group.get_absolute_url(),
             "short_id": group.short_id,  # Короткий ID проблемы
             "times_seen": group.times_seen,  # Количество раз, сколько проблема произошла
             "platform": event.platform or "[NA]",  # Платформа
             "event_datetime": event.datetime or "[NA]",  # Время события
             "event_level": event_tags['level'],
         }
+        if "title" in template_fields:
+            message_params["title"] = self._escape_markdown_v1(truncatechars(event.title, EVENT_TITLE_MAX_LENGTH))
+        if "url" in template_fields:
+            message_params["url"] = group.get_absolute_url()
+
         text = self.compile_message_text(
             message_template,
             message_params,
             escaped_event_message,
         )
 
-        return {
-            "text": text,
-            "parse_mode": "Markdown",
-        }
+        payload = {"text": text}
+        # Экранированные символы тоже содержат разметку, так что parse_mode не теряется и для них.
+        if _MARKDOWN_V1_ENTITY_RE.search(text):
+            payload["parse_mode"] = "Markdown"
+        return payload
 
     def build_url(self, api_origin: str, api_token: str) -> str:
-        return f"{api_origin}/bot{api_token}/sendMessage"
+        return _build_send_url(api_origin, api_token)
 
     def _mask_url_token(self, url: str) -> str:
         """Маскирует API токен в URL для логирования."""
-        parsed_url = urlparse(url)
-        path_parts = parsed_url.path.split('/')
-        if len(path_parts) > 2 and path_parts[1] == 'bot':
-            path_parts[2] = '...'  # Заменяем токен на троеточие
-        masked_path = '/'.join(path_parts)
-        return f"{parsed_url.scheme}://{parsed_url.netloc}{masked_path}{'?' + parsed_url.query if parsed_url.query else ''}"
+        return _BOT_TOKEN_RE.sub(r"\1...", url, count=1)  # Заменяем токен на троеточие
 
     def get_receivers_list(self, receivers_str: str) -> List[List[str]]:
         """Парсит строку получателей в список списков [chat_id, message_thread_id]."""
         if not receivers_str:
             return []
-        parsed_receivers: List[List[str]] = []
-        for part in receivers_str.split(";"):
-            stripped_part = part.strip()
-            if stripped_part:
-                parsed_receivers.append(stripped_part.split("/", maxsplit=1))
-        return parsed_receivers
-
-    def send_message(self, url: str, payload: Dict[str, Any], receiver: List[str]):
-        """Отправляет сообщение одному получателю Telegram."""
+        return [list(receiver) for receiver in _parse_receivers(receivers_str)]
+
+    def send_message(
+            self,
+            url: str,
+            payload: Dict[str, Any],
+            receiver: Sequence[str],
+            encoded_payload: Optional[bytes] = None,
+    ):
+        """
+        Отправляет сообщение одному получателю Telegram.
+        encoded_payload - заранее сериализованный payload, общий для всех получателей канала.
+        """
         chat_id = receiver[0]
-        payload_copy = payload.copy()
-        payload_copy["chat_id"] = chat_id
-        if len(receiver) > 1:
-            payload_copy["message_thread_id"] = receiver[1]
-
-        logger.debug("Sending message to %s" % receiver)
+        if encoded_payload is None:
+            encoded_payload = dumps(payload)
+        # Получатели отличаются только chat_id / message_thread_id - дописываем их к готовым байтам.
+        # Тело payload копируется один раз, в join, без промежуточных срезов и конкатенаций.
+        prefix = _receiver_json_prefix(tuple(receiver))
+        if encoded_payload == b"{}":
+            data = prefix + b"}"
+        else:
+            data = b"".join((prefix, b",", memoryview(encoded_payload)[1:]))
+
+        logger.debug("Sending message to %s", receiver)
         try:
-            response = safe_urlopen(
-                method="POST",
-                url=url,
-                json=payload_copy,
+            response = get_session(url).post(
+                url,
+                data=data,
+                headers=_JSON_HEADERS,
+                allow_redirects=False,
+                timeout=SEND_TIMEOUT,
             )
             response.raise_for_status()
-            logger.debug(
-                "Response code: %s, content: %s"
-                % (response.status_code, response.content)
-            )
+            logger.debug("Response code: %s, content: %s", response.status_code, response.content)
         except Exception as e:
-            logger.error(
-                f"Failed to send message to chat_id {chat_id}: {e}", exc_info=True
-            )
+            logger.error("Failed to send message to chat_id %s: %s", chat_id, e, exc_info=True)
 
-    def _match_filter(self, event: Any, filter_type: str, filter_value: str) -> bool:
-        """Проверяет, соответствует ли событие заданному фильтру."""
-        if filter_type == "regex__message":
-            return bool(re.search(filter_value, event.message or "", re.IGNORECASE))
-        elif filter_type == "regex__title":
-            return bool(re.search(filter_value, event.title or "", re.IGNORECASE))
-        elif filter_type.startswith("tag__"):
-            tag_name = filter_type.split("__", 1)[1]
-            tag_value = dict(event.tags).get(tag_name)
-            return bool(tag_value and re.search(filter_value, tag_value, re.IGNORECASE))
-        elif filter_type == "level":
-            return event.level == filter_value
-        elif filter_type == "project_slug":
-            return event.project and event.project.slug == filter_value
-        elif filter_type == "value__tag":
-            tags_dict = dict(event.tags)
-            return filter_value in tags_dict.values()
-        logger.warning(f"Неподдерживаемый тип фильтра: {filter_type}")
+    def _match_filter(
+            self, event: Any, filter_type: str, filter_value: Any, tags: Optional[Dict[str, str]] = None
+    ) -> bool:
+        """
+        Проверяет, соответствует ли событие заданному фильтру.
+        filter_value - значение фильтра или, для фильтров по регулярным выражениям, уже скомпилированный шаблон.
+        tags - заранее собранный словарь тегов события, чтобы не строить его на каждый фильтр.
+        """
+        if tags is None:
+            tags = dict(event.tags)
+        if isinstance(filter_value, str) and _is_pattern_filter(filter_type):
+            filter_value = compile_pattern(filter_value)
+        matcher = _FILTER_MATCHERS.get(filter_type)
+        if matcher is not None:
+            return matcher(event, tags, filter_value)
+        if filter_type.startswith("tag__"):
+            return _match_tag(event, tags, filter_type[len("tag__"):], filter_value)
+        logger.warning("Неподдерживаемый тип фильтра: %s", filter_type)
         return False
 
-    def _get_channels_config_data(self, project) -> Tuple[List[ChannelConfig], str]:
-        """Получает и парсит конфигурацию каналов из настроек проекта."""
+    def _get_channels_config_data(
+            self, project, resolve_api_origin: bool = True
+    ) -> Tuple[Sequence[_Channel], Optional[str]]:
+        """
+        Получает и парсит конфигурацию каналов из настроек проекта.
+        resolve_api_origin=False - не запрашивать api_origin из настроек проекта, если его нет
+        в конфигурации каналов: вызывающий код запросит его сам, когда он понадобится.
+        """
+        channels: Sequence[_Channel] = ()
+        api_origin: Optional[str] = None
         config_json = self.get_option("channels_config_json", project)
         if not config_json:
-            logger.info(f"channels_config_json is empty for project {project.slug}")
-            return [], self.get_option("api_origin", project)
-
-        try:
-            config: ChannelsConfigJson = json.loads(config_json)
-
-            if not isinstance(config, dict):
+            logger.info("channels_config_json is empty for project %s", project.slug)
+        else:
+            try:
+                channels, api_origin = _parse_channels_config(config_json)
+            except json.JSONDecodeError as e:
                 logger.error(
-                    f"Channels configuration for project {project.slug} must be a dictionary."
+                    "Invalid JSON in channels_config_json for project %s: %s",
+                    project.slug, e, exc_info=True
                 )
-                return [], self.get_option("api_origin", project)
-
-            if "channels" not in config or not isinstance(config["channels"], list):
-                logger.error(
-                    f"Channels configuration for project {project.slug} must contain a 'channels' key with a list of channel objects."
-                )
-                return [], self.get_option("api_origin", project)
-            if "api_origin" in config and not isinstance(config["api_origin"], str):
+            except ValueError as e:
+                logger.error("Invalid channels configuration for project %s: %s", project.slug, e)
+            except Exception as e:
                 logger.error(
-                    f"The 'api_origin' in Channels Configuration for project {project.slug} must be a string."
+                    "Unexpected error loading channels config for project %s: %s", project.slug, e, exc_info=True
                 )
-                return [], self.get_option("api_origin", project)
 
-            return config.get("channels", []), config.get(
-                "api_origin", self.get_option("api_origin", project)
-            )
-        except json.JSONDecodeError as e:
-            logger.error(
-                "Invalid JSON in channels_config_json for project %s: %s",
-                project.slug, e, exc_info=True
-            )
-            return [], self.get_option("api_origin", project)
-        except Exception as e:
-            logger.error(
-                f"Unexpected error loading channels config for project {project.slug}: {e}",
-                exc_info=True,
-            )
-            return [], self.get_option("api_origin", project)
+        if api_origin is None and resolve_api_origin:
+            api_origin = self.get_option("api_origin", project)
+        return channels, api_origin
 
-    def _get_matching_channels(self, event: Any, channels_config: List[ChannelConfig]) -> List[ChannelConfig]:
+    def _get_matching_channels(
+            self,
+            event: Any,
+            channels_config: Sequence[Union[_Channel, ChannelConfig]],
+            tags: Optional[Dict[str, str]] = None,
+    ) -> List[_Channel]:
         """
         Определяет, какие каналы соответствуют событию на основе их фильтров.
-        Возвращает список подходящих конфигураций каналов.
+        Возвращает список подходящих каналов.
+        Каналы без фильтров считаются дефолтными и используются, только если ни один
+        канал с фильтрами не подошел.
         """
-        matching_channels: List[ChannelConfig] = []
-        default_channel: Optional[ChannelConfig] = None
-
-        for channel_config in channels_config:
-            filters = channel_config.get("filters", [])
+        # Если ни у одного канала нет фильтров, все они дефолтные и подходят любому событию.
+        if not getattr(channels_config, "any_filters", True):
+            return list(channels_config)
+
+        event_tags = tags if tags is not None else dict(event.tags)
+
+        if isinstance(channels_config, _ParsedChannels):
+            # Разбиение на дефолтные и фильтруемые каналы уже сделано при разборе конфигурации.
+            matching_channels = [
+                channel for channel in channels_config.filtered_channels
+                if all(predicate(event, event_tags) for predicate in channel.filters)
+            ]
+            matching_channels = matching_channels or list(channels_config.default_channels)
+            logger.info("_get_matching_channels: %s", matching_channels)
+            return matching_channels
+
+        matching_channels: List[_Channel] = []
+        default_channels: List[_Channel] = []
+        for channel in channels_config:
+            # Каналы из _parse_channels_config уже разобраны, словари разбираются на месте.
+            if isinstance(channel, dict):
+                channel = _freeze_channel(channel)
+
+            filters = channel.filters
+            if filters is None:
+                continue
             if not filters:
-                matching_channels.append(channel_config)
-
-            all_filters_match = True
-            for f in filters:
-                filter_type = f.get("type")
-                filter_value = f.get("value")
-                if (
-                        not filter_type
-                        or not filter_value
-                        or not self._match_filter(event, filter_type, filter_value)
-                ):
-                    all_filters_match = False
-                    break
+                default_channels.append(channel)
+                continue
 
-            if all_filters_match and filters:
-                matching_channels.append(channel_config)
+            if all(predicate(event, event_tags) for predicate in filters):
+                matching_channels.append(channel)
 
-        # Если не нашлось ни одного канала, соответствующего фильтрам,
-        # и при этом есть дефолтный канал, используем его.
-        if not matching_channels and default_channel:
-            matching_channels.append(default_channel)
-        logger.info(f"_get_matching_channels: {matching_channels}")
+        # Если не нашлось ни одного канала, соответствующего фильтрам, используем дефолтные.
+        matching_channels = matching_channels or default_channels
+        logger.info("_get_matching_channels: %s", matching_channels)
 
         return matching_channels
 
     def notify_users(self, group, event, fail_silently=False, **kwargs) -> None:
         """Отправка уведомлений."""
-        logger.debug("Received notification for event: %s" % event)
+        logger.debug("Received notification for event: %s", event)
 
+        # api_origin из настроек проекта запрашивается ниже, только если он понадобится.
         channels_config, global_api_origin = self._get_channels_config_data(
-            group.project
+            group.project, resolve_api_origin=False
         )
-        default_template = self.get_option("default_message_template", group.project)
 
         if not channels_config:
             logger.info(
@@ -400,7 +783,9 @@ class TelegramNotificationsPlugin(notify.NotificationPlugin):
             )
             return
 
-        matching_channels = self._get_matching_channels(event, channels_config)
+        # Теги собираются в словарь один раз и используются и фильтрами, и шаблонами.
+        event_tags = _TagsDict(event.tags)
+        matching_channels = self._get_matching_channels(event, channels_config, event_tags)
 
         if not matching_channels:
             logger.info(
@@ -409,36 +794,83 @@ class TelegramNotificationsPlugin(notify.NotificationPlugin):
             )
             return
 
+        # Шаблон по умолчанию запрашивается, только если он понадобился, и не больше одного раза за событие.
+        default_template: Optional[str] = None
+        # Ключ (url, получатель, тело) схлопывает одинаковые сообщения одному получателю из разных каналов.
+        sends: Dict[Tuple[str, Tuple[str, ...], bytes], Dict[str, Any]] = {}
         for channel_to_send in matching_channels:
-            api_token = channel_to_send.get("api_token")
-            receivers_str = channel_to_send.get("receivers")
-            channel_template = channel_to_send.get("template") or default_template
-            api_origin = channel_to_send.get("api_origin", global_api_origin)
+            api_token = channel_to_send.api_token
+            receivers_str = channel_to_send.receivers
+            channel_template = channel_to_send.template
+            api_origin = channel_to_send.api_origin
 
             if not api_token or not receivers_str:
                 logger.warning(
-                    f"Channel missing api_token or receivers for project {group.project.slug}. Notification skipped for this channel."
+                    "Channel missing api_token or receivers for project %s. Notification skipped for this channel.",
+                    group.project.slug,
                 )
                 continue
 
-            receivers = self.get_receivers_list(receivers_str)
+            receivers = channel_to_send.parsed_receivers
             if not receivers:
                 logger.warning(
-                    f"No valid receivers parsed for channel {receivers_str} in project {group.project.slug}. Notification skipped for this channel."
+                    "No valid receivers parsed for channel %s in project %s. Notification skipped for this channel.",
+                    receivers_str,
+                    group.project.slug,
                 )
                 continue
 
-            logger.debug(
-                "Sending to receivers: %s for channel %s"
-                % (", ".join(["/".join(item) for item in receivers] or ()), receivers_str)
-            )
-
-            payload = self.build_message(group, event, channel_template)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Sending to receivers: %s for channel %s",
+                    ", ".join(["/".join(item) for item in receivers]),
+                    receivers_str,
+                )
 
-            url = self.build_url(api_origin, api_token)
-            logger.info("Built URL for sending for channel %s: %s" % (receivers_str, self._mask_url_token(url)))
+            if not channel_template:
+                if default_template is None:
+                    default_template = self.get_option("default_message_template", group.project)
+                channel_template = default_template
+
+            payload = self.build_message(group, event, channel_template, event_tags)
+            encoded_payload = dumps(payload)
+
+            # URL канала строится при разборе конфигурации, если его origin известен заранее.
+            url = channel_to_send.send_url
+            if url is None:
+                if not api_origin:
+                    if global_api_origin is None:
+                        global_api_origin = self.get_option("api_origin", group.project)
+                    api_origin = global_api_origin
+                url = self.build_url(api_origin, api_token)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Built URL for sending for channel %s: %s", receivers_str, self._mask_url_token(url))
 
             for receiver in receivers:
-                safe_execute(
-                    self.send_message, url, payload, receiver, _with_transaction=False
-                )
\ No newline at end of file
+                send_key = (url, receiver, encoded_payload)
+                if send_key in sends:
+                    logger.debug("Skipping duplicate message to %s for channel %s", receiver, receivers_str)
+                    continue
+                sends[send_key] = payload
+
+        if len(sends) == 1:
+            ((url, receiver, encoded_payload), payload), = sends.items()
+            safe_execute(self.send_message, url, payload, receiver, encoded_payload, _with_transaction=False)
+            return
+
+        # Запросы к разным получателям и каналам независимы - отправляем их параллельно.
+        _done, not_done = wait(
+            [
+                _send_executor.submit(
+                    safe_execute, self.send_message, url, payload, receiver, encoded_payload, _with_transaction=False
+                )
+                for (url, receiver, encoded_payload), payload in sends.items()
+            ],
+            timeout=SEND_WAIT_TIMEOUT,
+        )
+        if not_done:
+            # Оставшиеся отправки не отменяются и завершатся в фоне.
+            logger.warning(
+                "%s of %s Telegram messages for project %s are still being sent after %s seconds.",
+                len(not_done), len(sends), group.project.slug, SEND_WAIT_TIMEOUT,
+            )
\ No newline at end of file
@@ -0,0 +1,22 @@
+# coding: utf-8
+"""
+JSON-сериализация: orjson, если он установлен, иначе стандартный json.
+orjson.JSONDecodeError наследует json.JSONDecodeError, поэтому обработчики ошибок общие.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    loads = json.loads
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
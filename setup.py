@@ -30,6 +30,10 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     license='MIT',
+    extras_require={
+        'orjson': ['orjson'],
+        're2': ['google-re2'],
+    },
     entry_points={
         'sentry.plugins': [
             'sentry_telegram_plus = sentry_telegram_plus.plugin:TelegramNotificationsPlugin',
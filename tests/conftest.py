@@ -1,8 +1,127 @@
 # coding: utf-8
+import json
 import os
 
+import pytest
+
 
 os.environ.setdefault('DB', 'sqlite')
 pytest_plugins = [
     'sentry.utils.pytest',
 ]
+
+
+# Легковесные заменители моделей Sentry: обычные объекты со __slots__ вместо MagicMock,
+# у которых каждое обращение к атрибуту создает дочерний mock.
+class MockProject(object):
+    __slots__ = ('name', 'slug', 'id')
+
+    def __init__(self, name="Test Project", slug="test-project", id=1):
+        self.name = name
+        self.slug = slug
+        self.id = id
+
+
+class MockGroup(object):
+    __slots__ = ('project', 'short_id', 'times_seen')
+
+    def __init__(self, project=None, short_id="TEST-1", times_seen=1):
+        self.project = project if project is not None else MockProject()
+        self.short_id = short_id
+        self.times_seen = times_seen
+
+    def get_absolute_url(self):
+        return "http://mock.url"
+
+
+class MockEvent(object):
+    __slots__ = ('message', 'title', 'level', 'project', 'group', 'tags', 'platform', 'datetime', 'event_id')
+
+    def __init__(self, message="", title="Untitled", level="info", project=None, group=None, tags=None,
+                 platform="python", datetime=None, event_id="event-1"):
+        self.message = message
+        self.title = title
+        self.level = level
+        self.project = project if project is not None else MockProject()
+        self.group = group if group is not None else MockGroup(project=self.project)
+        self.tags = tags if tags is not None else []
+        self.platform = platform
+        self.datetime = datetime
+        self.event_id = event_id
+
+    def get_absolute_url(self):
+        return self.group.get_absolute_url()
+
+
+@pytest.fixture
+def plugin_and_project(monkeypatch):
+    """
+    Плагин и проект, настройки которого хранятся в памяти, а не в ProjectOption:
+    MockProject не является моделью, и тестам логики плагина база данных не нужна.
+    """
+    from sentry_telegram_plus.plugin import TelegramNotificationsPlugin
+
+    plugin = TelegramNotificationsPlugin()
+    project = MockProject()
+    options = {}
+
+    def set_option(key, value, project=None, user=None):
+        options[(project.id if project is not None else None, key)] = value
+
+    def get_option(key, project=None, user=None):
+        return options.get((project.id if project is not None else None, key))
+
+    monkeypatch.setattr(plugin, 'set_option', set_option)
+    monkeypatch.setattr(plugin, 'get_option', get_option)
+    return plugin, project
+
+
+@pytest.fixture
+def capture_send_message(plugin_and_project, monkeypatch):
+    """
+    Подменяет send_message плагина функцией, которая только запоминает аргументы вызова:
+    без MagicMock и построения объектов _Call на каждый вызов.
+    Возвращает (plugin, project, calls), где calls - список словарей с аргументами send_message.
+    """
+    plugin, project = plugin_and_project
+    calls = []
+
+    def send_message(url, payload, receiver, encoded_payload=None):
+        # list.append атомарен, поэтому вызовы из пула отправки не теряются.
+        calls.append({'url': url, 'payload': payload, 'receiver': receiver, 'encoded_payload': encoded_payload})
+
+    monkeypatch.setattr(plugin, 'send_message', send_message)
+    return plugin, project, calls
+
+
+@pytest.fixture
+def routing_integration(monkeypatch):
+    """
+    Интеграция с настройками в памяти вместо модели OrganizationIntegration
+    и _send_payload, который только запоминает запросы.
+    Возвращает (make_integration, calls): make_integration(channels, **config) создает интеграцию
+    с указанными каналами, calls - список словарей с url, chat_id и телом каждого запроса.
+    """
+    from collections import OrderedDict
+
+    from sentry_telegram_plus import integration as integration_module
+    from sentry_telegram_plus.integration import TelegramRoutingIntegration
+
+    calls = []
+    # Учет уже отправленных сообщений общий для модуля - каждый тест начинает с пустого.
+    monkeypatch.setattr(integration_module, '_recent_sends', OrderedDict())
+
+    def send_payload(self, url, headers, chat_id, data):
+        calls.append({'url': url, 'chat_id': chat_id, 'data': data})
+
+    monkeypatch.setattr(TelegramRoutingIntegration, '_send_payload', send_payload)
+
+    def make_integration(channels, **config):
+        integration = TelegramRoutingIntegration.__new__(TelegramRoutingIntegration)
+        config.setdefault('default_message_template', '{title}: {message}')
+        config['channels_config_json'] = json.dumps({'channels': channels})
+        # _config - cached_property: значение в __dict__ используется вместо get_config_data().
+        integration.__dict__['_config'] = config
+        return integration
+
+    return make_integration, calls
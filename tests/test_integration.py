@@ -0,0 +1,111 @@
+# coding: utf-8
+import pytest
+from django import forms
+
+from .conftest import MockEvent
+from sentry_telegram_plus.integration import TelegramRoutingIntegrationConfigForm
+from sentry_telegram_plus.serialization import dumps
+
+
+DEFAULT_CHANNEL = {"api_token": "default_token", "receivers": "100"}
+BROKEN_REGEX_CHANNEL = {
+    "api_token": "broken_token",
+    "receivers": "200",
+    "filters": [{"type": "regex__message", "value": "(bad"}],
+}
+
+
+def test_broken_filter_channel_does_not_block_default_channel(routing_integration):
+    make_integration, calls = routing_integration
+    integration = make_integration([DEFAULT_CHANNEL, BROKEN_REGEX_CHANNEL])
+    event = MockEvent(message="Something failed", title="Error")
+
+    assert integration.should_notify(None, event)
+    integration.send_message(None, event, "100", DEFAULT_CHANNEL)
+
+    assert [call["chat_id"] for call in calls] == ["100"]
+    assert "/botdefault_token/" in calls[0]["url"]
+
+
+@pytest.mark.parametrize("filters", [
+    [{"type": "regex__message", "value": "(bad"}],
+    [{"type": "tag__environment", "value": 5}],
+    [{"type": "level", "value": ["error"]}],
+    ["level"],
+    {"type": "level", "value": "error"},
+])
+def test_malformed_filters_never_match(routing_integration, filters):
+    make_integration, calls = routing_integration
+    integration = make_integration([{"api_token": "token", "receivers": "100", "filters": filters}])
+    event = MockEvent(message="Something failed", level="error", tags=[("environment", "5")])
+
+    assert not integration.should_notify(None, event)
+
+
+@pytest.mark.parametrize("filters", [
+    [{"type": "regex__message", "value": "(bad"}],
+    [{"type": "tag__environment", "value": 5}],
+    ["level"],
+])
+def test_form_rejects_malformed_filters(filters):
+    form = TelegramRoutingIntegrationConfigForm()
+    form.cleaned_data = {
+        "channels_config_json": dumps({"channels": [
+            DEFAULT_CHANNEL, {"api_token": "token", "receivers": "100", "filters": filters},
+        ]}).decode("utf-8"),
+    }
+
+    with pytest.raises(forms.ValidationError):
+        form.clean()
+
+
+@pytest.mark.parametrize("channel", [
+    {"api_token": "token", "receivers": "100", "template": None},
+    {"api_token": None, "receivers": None},
+    {"api_token": "token"},
+])
+def test_form_accepts_channels_the_runtime_accepts(channel):
+    form = TelegramRoutingIntegrationConfigForm()
+    form.cleaned_data = {"channels_config_json": dumps({"channels": [channel]}).decode("utf-8")}
+
+    assert form.clean() is form.cleaned_data
+
+
+def test_receiver_shared_by_two_channels_gets_one_message(routing_integration):
+    make_integration, calls = routing_integration
+    errors_channel = {"api_token": "token", "receivers": "100;200", "filters": [{"type": "level", "value": "error"}]}
+    backend_channel = {"api_token": "token", "receivers": "200;300", "filters": [{"type": "tag__team", "value": "backend"}]}
+    integration = make_integration([errors_channel, backend_channel])
+    event = MockEvent(message="Something failed", level="error", tags=[("team", "backend")])
+
+    # Sentry вызывает send_message отдельно для каждого подходящего канала.
+    integration.send_message(None, event, "errors", errors_channel)
+    integration.send_message(None, event, "backend", backend_channel)
+
+    assert sorted(call["chat_id"] for call in calls) == ["100", "200", "300"]
+
+
+def test_next_event_is_sent_to_shared_receiver_again(routing_integration):
+    make_integration, calls = routing_integration
+    channel = {"api_token": "token", "receivers": "100"}
+    integration = make_integration([channel])
+
+    integration.send_message(None, MockEvent(message="first", event_id="event-1"), "100", channel)
+    integration.send_message(None, MockEvent(message="second", event_id="event-2"), "100", channel)
+
+    assert [call["chat_id"] for call in calls] == ["100", "100"]
+
+
+@pytest.mark.parametrize("value, message", [
+    ("s", "ſ"),  # ASCII-подстрока и длинная s: lower() их не сравнивает, re.IGNORECASE - да
+    ("k", "K"),  # знак Кельвина
+    ("Σ", "ς"),
+    ("^(fatal|sigma)$", "ſigma"),
+])
+def test_literal_filters_follow_ignorecase(routing_integration, value, message):
+    make_integration, calls = routing_integration
+    integration = make_integration([
+        {"api_token": "token", "receivers": "100", "filters": [{"type": "regex__message", "value": value}]},
+    ])
+
+    assert integration.should_notify(None, MockEvent(message=message))
@@ -1,16 +1,24 @@
+import ast
 import pytest
 import json
-import re
 from unittest.mock import patch, MagicMock
-from conftest import MockEvent, MockProject
+from .conftest import MockEvent, MockGroup
 
 from sentry_telegram_plus.plugin import (
-    TelegramNotificationsPlugin,
     TelegramNotificationsOptionsForm,
     ValidationError,
     TELEGRAM_MAX_MESSAGE_LENGTH,
-    EVENT_TITLE_MAX_LENGTH,
+    TRUNCATE_WARNING_TEXT,
 )
+from sentry_telegram_plus.serialization import dumps
+
+
+def _calls_by_chat(calls):
+    """
+    Группирует перехваченные вызовы send_message по chat_id получателя: отправки выполняются параллельно,
+    поэтому тесты не опираются на порядок вызовов.
+    """
+    return {call['receiver'][0]: call for call in calls}
 
 
 class TestTelegramNotificationsPluginLogic:
@@ -19,7 +27,7 @@ class TestTelegramNotificationsPluginLogic:
         plugin_instance.set_option('api_origin', default_api_origin, project=project_mock)
         plugin_instance.set_option(
             'channels_config_json',
-            json.dumps(channels_config),
+            dumps(channels_config).decode(),
             project=project_mock
         )
         plugin_instance.set_option(
@@ -28,8 +36,8 @@ class TestTelegramNotificationsPluginLogic:
             project=project_mock
         )
 
-    def test_notify_no_filters_all_channels_sent(self, plugin_and_project):
-        plugin, project_mock = plugin_and_project
+    def test_notify_no_filters_all_channels_sent(self, capture_send_message):
+        plugin, project_mock, calls = capture_send_message
         config = {
             "api_origin": "https://api.telegram.org",
             "channels": [
@@ -40,25 +48,24 @@ class TestTelegramNotificationsPluginLogic:
         self._set_plugin_config(plugin, project_mock, config)
         event_mock = MockEvent(message="Hello from Sentry!")
 
-        with patch.object(plugin, 'send_message') as mock_send_message:
-            plugin.notify_users(group=event_mock.group, event=event_mock)
+        plugin.notify_users(group=event_mock.group, event=event_mock)
 
-            assert mock_send_message.call_count == 2
+        assert len(calls) == 2
+        calls_by_chat = _calls_by_chat(calls)
+        assert set(calls_by_chat) == {'chat1', 'chat2'}
 
-            call_args_1 = mock_send_message.call_args_list[0].kwargs
-            assert call_args_1['url'] == f"{config['api_origin']}/bot{config['channels'][0]['api_token']}/sendMessage"
-            assert call_args_1['payload']['chat_id'] == 'chat1'
-            assert call_args_1['payload']['text'] == "Test 1: Hello from Sentry!"
-            assert call_args_1['receiver'] == ['chat1']
+        call_args_1 = calls_by_chat['chat1']
+        assert call_args_1['url'] == f"{config['api_origin']}/bot{config['channels'][0]['api_token']}/sendMessage"
+        assert call_args_1['payload']['text'] == "Test 1: Hello from Sentry!"
+        assert list(call_args_1['receiver']) == ['chat1']
 
-            call_args_2 = mock_send_message.call_args_list[1].kwargs
-            assert call_args_2['url'] == f"{config['api_origin']}/bot{config['channels'][1]['api_token']}/sendMessage"
-            assert call_args_2['payload']['chat_id'] == 'chat2'
-            assert call_args_2['payload']['text'] == "Test 2: Hello from Sentry!"
-            assert call_args_2['receiver'] == ['chat2']
+        call_args_2 = calls_by_chat['chat2']
+        assert call_args_2['url'] == f"{config['api_origin']}/bot{config['channels'][1]['api_token']}/sendMessage"
+        assert call_args_2['payload']['text'] == "Test 2: Hello from Sentry!"
+        assert list(call_args_2['receiver']) == ['chat2']
 
-    def test_notify_matching_filter_sends_to_filtered_channel(self, plugin_and_project):
-        plugin, project_mock = plugin_and_project
+    def test_notify_matching_filter_sends_to_filtered_channel(self, capture_send_message):
+        plugin, project_mock, calls = capture_send_message
         config = {
             "api_origin": "https://api.telegram.org",
             "channels": [
@@ -70,16 +77,16 @@ class TestTelegramNotificationsPluginLogic:
         self._set_plugin_config(plugin, project_mock, config)
         event_mock = MockEvent(message="Something critical happened!", level="fatal")
 
-        with patch.object(plugin, 'send_message') as mock_send_message:
-            plugin.notify_users(group=event_mock.group, event=event_mock)
+        plugin.notify_users(group=event_mock.group, event=event_mock)
 
-            assert mock_send_message.call_count == 1
-            call_args = mock_send_message.call_args_list[0].kwargs
-            assert call_args['payload']['chat_id'] == config['channels'][0]['receivers']
-            assert call_args['payload']['text'] == "Filtered: Something critical happened!"
+        assert len(calls) == 1
+        calls_by_chat = _calls_by_chat(calls)
+        assert set(calls_by_chat) == {config['channels'][0]['receivers']}
+        call_args = calls_by_chat[config['channels'][0]['receivers']]
+        assert call_args['payload']['text'] == "Filtered: Something critical happened!"
 
-    def test_notify_non_matching_filter_skips_channel(self, plugin_and_project):
-        plugin, project_mock = plugin_and_project
+    def test_notify_non_matching_filter_skips_channel(self, capture_send_message):
+        plugin, project_mock, calls = capture_send_message
         config = {
             "api_origin": "https://api.telegram.org",
             "channels": [
@@ -91,13 +98,78 @@ class TestTelegramNotificationsPluginLogic:
         self._set_plugin_config(plugin, project_mock, config)
         event_mock = MockEvent(message="Just a warning.", level="warning")  # Does not match 'critical'
 
-        with patch.object(plugin, 'send_message') as mock_send_message:
-            plugin.notify_users(group=event_mock.group, event=event_mock)
+        plugin.notify_users(group=event_mock.group, event=event_mock)
+
+        assert len(calls) == 1
+        calls_by_chat = _calls_by_chat(calls)
+        assert set(calls_by_chat) == {config['channels'][1]['receivers']}
+        call_args = calls_by_chat[config['channels'][1]['receivers']]
+        assert call_args['payload']['text'] == "Default: Just a warning."
+
+    def test_notify_tag_level_filter_sends_to_filtered_channel(self, capture_send_message):
+        plugin, project_mock, calls = capture_send_message
+        config = {
+            "api_origin": "https://api.telegram.org",
+            "channels": [
+                {"api_token": "token_filtered", "receivers": "chat_filtered",
+                 "filters": [{"type": "tag__level", "value": "^(fatal|error)$"}], "template": "Filtered: {message}"},
+                {"api_token": "token_default", "receivers": "chat_default", "template": "Default: {message}"},
+            ]
+        }
+        self._set_plugin_config(plugin, project_mock, config)
+        event_mock = MockEvent(message="Something broke", level="fatal", tags=[("level", "fatal")])
+
+        plugin.notify_users(group=event_mock.group, event=event_mock)
+
+        assert len(calls) == 1
+        calls_by_chat = _calls_by_chat(calls)
+        assert set(calls_by_chat) == {config['channels'][0]['receivers']}
+        assert calls_by_chat[config['channels'][0]['receivers']]['payload']['text'] == "Filtered: Something broke"
+
+    @pytest.mark.parametrize("filters", [
+        [{"type": "regex__message", "value": "(unclosed"}],
+        ["level"],
+        {"type": "level", "value": "fatal"},
+        [{"type": "level", "value": 5}],
+        [{"type": "tag__level", "value": ["a"]}],
+        [{"type": 5, "value": "fatal"}],
+        [{"type": "unknown", "value": "fatal"}],
+    ])
+    def test_options_form_rejects_invalid_filters(self, filters):
+        config = {
+            "channels": [
+                {"api_token": "token", "receivers": "chat", "filters": filters},
+            ]
+        }
+        form = TelegramNotificationsOptionsForm()
+        form.cleaned_data = {'channels_config_json': json.dumps(config)}
+
+        with pytest.raises(ValidationError):
+            form.clean_channels_config_json()
+
+    @pytest.mark.parametrize("filters", [
+        ["level"],
+        {"type": "level", "value": "fatal"},
+        [{"type": "level", "value": 5}],
+        [{"type": "tag__level", "value": ["fatal"]}],
+        [{"type": 5, "value": "fatal"}],
+    ])
+    def test_notify_malformed_filters_skip_only_that_channel(self, capture_send_message, filters):
+        plugin, project_mock, calls = capture_send_message
+        config = {
+            "api_origin": "https://api.telegram.org",
+            "channels": [
+                {"api_token": "token_filtered", "receivers": "chat_filtered", "filters": filters,
+                 "template": "Filtered: {message}"},
+                {"api_token": "token_default", "receivers": "chat_default", "template": "Default: {message}"},
+            ]
+        }
+        self._set_plugin_config(plugin, project_mock, config)
+        event_mock = MockEvent(message="Something broke", level="fatal", tags=[("level", "fatal")])
+
+        plugin.notify_users(group=event_mock.group, event=event_mock)
 
-            assert mock_send_message.call_count == 1
-            call_args = mock_send_message.call_args_list[0].kwargs
-            assert call_args['payload']['chat_id'] == config['channels'][1]['receivers']
-            assert call_args['payload']['text'] == "Default: Just a warning."
+        assert set(_calls_by_chat(calls)) == {'chat_default'}
 
     def test_send_message_with_message_thread_id(self, plugin_and_project):
         plugin, project_mock = plugin_and_project
@@ -108,34 +180,107 @@ class TestTelegramNotificationsPluginLogic:
 
         url = plugin.build_url(api_origin, api_token)
         payload = plugin.build_message(
-            group=MagicMock(project=project_mock, get_absolute_url=MagicMock(return_value="http://mock.url")),
+            group=MockGroup(project=project_mock),
             event=MockEvent(message=message_content, title="Test Title"),
             message_template="{message}"
         )
 
-        with patch('sentry_telegram_plus.plugin.safe_urlopen') as mock_safe_urlopen:
+        with patch('sentry_telegram_plus.plugin.get_session') as mock_get_session:
             mock_response = MagicMock()
             mock_response.status_code = 200
             mock_response.raise_for_status.return_value = None
-            mock_safe_urlopen.return_value = mock_response
+            mock_session = mock_get_session.return_value
+            mock_session.post.return_value = mock_response
 
             plugin.send_message(url=url, payload=payload, receiver=receiver_with_topic)
 
             expected_chat_id = "12345"
             expected_message_thread_id = "678"
 
-            mock_safe_urlopen.assert_called_once_with(
-                method="POST",
-                url=url,
-                json={
-                    'chat_id': expected_chat_id,
-                    'text': message_content,
-                    'parse_mode': 'Markdown',
-                    'message_thread_id': expected_message_thread_id
-                },
-            )
+            mock_get_session.assert_called_once_with(url)
+            mock_session.post.assert_called_once()
+            post_args = mock_session.post.call_args
+            assert post_args.args == (url,)
+            assert post_args.kwargs['headers'] == {'Content-Type': 'application/json'}
+            assert post_args.kwargs['allow_redirects'] is False
+            assert post_args.kwargs['timeout'] == 30
+            assert json.loads(post_args.kwargs['data']) == {
+                'chat_id': expected_chat_id,
+                'text': message_content,
+                'message_thread_id': expected_message_thread_id
+            }
             mock_response.raise_for_status.assert_called_once()
 
+    def test_build_url_is_cached(self, plugin_and_project):
+        plugin, _ = plugin_and_project
+        url = plugin.build_url("https://api.telegram.org", "mock:token")
+        assert url == "https://api.telegram.org/botmock:token/sendMessage"
+        assert plugin.build_url("https://api.telegram.org", "mock:token") is url
+
+    def test_build_message_parse_mode_only_with_markdown(self, plugin_and_project):
+        plugin, project_mock = plugin_and_project
+        group = MockGroup(project=project_mock)
+
+        plain = plugin.build_message(group, MockEvent(message="plain text"), "{message}")
+        assert plain == {'text': "plain text"}
+
+        formatted = plugin.build_message(group, MockEvent(message="plain text"), "*{message}*")
+        assert formatted == {'text': "*plain text*", 'parse_mode': 'Markdown'}
+
+        escaped = plugin.build_message(group, MockEvent(message="snake_case"), "{message}")
+        assert escaped['parse_mode'] == 'Markdown'
+
+    def test_build_message_long_message_fits_telegram_limit(self, plugin_and_project):
+        plugin, _ = plugin_and_project
+        event_mock = MockEvent(message="x" * 10000)
+
+        payload = plugin.build_message(event_mock.group, event_mock, "Long: {message} :end")
+
+        text = payload['text']
+        assert len(text) == TELEGRAM_MAX_MESSAGE_LENGTH
+        assert text.endswith(TRUNCATE_WARNING_TEXT + " :end")
+        kept = text[len("Long: "):-len(TRUNCATE_WARNING_TEXT + " :end")]
+        assert text.startswith("Long: ") and kept == "x" * len(kept)
+        assert len(kept) == TELEGRAM_MAX_MESSAGE_LENGTH - len("Long:  :end") - len(TRUNCATE_WARNING_TEXT)
+
+    def test_compile_message_text_truncates_each_message_copy(self, plugin_and_project):
+        plugin, _ = plugin_and_project
+
+        text = plugin.compile_message_text("{message}{message}", {}, "x" * 10000)
+
+        assert len(text) == TELEGRAM_MAX_MESSAGE_LENGTH
+        first, second = text[:len(text) // 2], text[len(text) // 2:]
+        assert first == second
+        assert first.startswith("xxx") and first.endswith(TRUNCATE_WARNING_TEXT)
+
+    def test_compile_message_text_sizes_repr_message_by_rendered_length(self, plugin_and_project):
+        plugin, _ = plugin_and_project
+        # repr удваивает обратные слэши экранирования: на символ текста приходится полтора символа результата.
+        text = plugin.compile_message_text("{message!r}", {}, "\\_" * 3000)
+
+        assert TELEGRAM_MAX_MESSAGE_LENGTH - 3 <= len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH
+        message = ast.literal_eval(text)
+        assert message.endswith("\\_" + TRUNCATE_WARNING_TEXT)
+
+    def test_compile_message_text_hard_cut_keeps_escape_whole(self, plugin_and_project):
+        plugin, _ = plugin_and_project
+        limit = TELEGRAM_MAX_MESSAGE_LENGTH - len(TRUNCATE_WARNING_TEXT)
+        # Лимит приходится между обратным слэшем и экранируемым символом.
+        title = "a" * (limit - 1) + "\\_" + "b" * 100
+
+        text = plugin.compile_message_text("{title}", {"title": title}, "")
+
+        assert text == "a" * (limit - 1) + TRUNCATE_WARNING_TEXT
+
+    def test_compile_message_text_hard_cut_closes_open_entity(self, plugin_and_project):
+        plugin, _ = plugin_and_project
+        limit = TELEGRAM_MAX_MESSAGE_LENGTH - len(TRUNCATE_WARNING_TEXT)
+
+        text = plugin.compile_message_text("*{title}* ```{title}```", {"title": "a" * 5000}, "")
+
+        assert text == "*" + "a" * (limit - 2) + "*" + TRUNCATE_WARNING_TEXT
+        assert len(text) == TELEGRAM_MAX_MESSAGE_LENGTH
+
     def test_get_receivers_single(self, plugin_and_project):
         plugin, _ = plugin_and_project
         assert plugin.get_receivers_list('chat1') == [['chat1']]
@@ -177,8 +322,8 @@ class TestTelegramNotificationsPluginLogic:
         assert plugin.is_configured(project_mock) is False
 
 
-    def test_find_matching_channel_no_match_returns_none(self, plugin_and_project):
-        plugin, project_mock = plugin_and_project
+    def test_get_matching_channels_no_match_returns_empty(self, plugin_and_project):
+        plugin, _ = plugin_and_project
         channels_config = {
             "channels": [
                 {"api_token": "token1", "receivers": "chat1",
@@ -187,11 +332,10 @@ class TestTelegramNotificationsPluginLogic:
         }
         event = MockEvent(message="Just some info.")
 
-        matching_channel = plugin._find_matching_channel(channels_config["channels"], event)
-        assert matching_channel is None
+        assert plugin._get_matching_channels(event, channels_config["channels"]) == []
 
-    def test_find_matching_channel_no_filters_matches_first(self, plugin_and_project):
-        plugin, project_mock = plugin_and_project
+    def test_get_matching_channels_falls_back_to_channel_without_filters(self, plugin_and_project):
+        plugin, _ = plugin_and_project
         channels_config = {
             "channels": [
                 {"api_token": "token1", "receivers": "chat1"},  # No filters
@@ -201,11 +345,12 @@ class TestTelegramNotificationsPluginLogic:
         }
         event = MockEvent(message="Any message.")
 
-        matching_channel = plugin._find_matching_channel(channels_config["channels"], event)
-        assert matching_channel == channels_config["channels"][0]  # Should pick the first one without filters
+        matching_channels = plugin._get_matching_channels(event, channels_config["channels"])
+        # Ни один канал с фильтрами не подошел - используется канал без фильтров.
+        assert [(channel.api_token, channel.receivers) for channel in matching_channels] == [("token1", "chat1")]
 
-    def test_find_matching_channel_channel_with_empty_filters_is_default(self, plugin_and_project):
-        plugin, project_mock = plugin_and_project
+    def test_get_matching_channels_channel_with_empty_filters_is_default(self, plugin_and_project):
+        plugin, _ = plugin_and_project
         channels_config = {
             "channels": [
                 {"api_token": "token1", "receivers": "chat1", "filters": []},  # Empty filters list
@@ -215,5 +360,5 @@ class TestTelegramNotificationsPluginLogic:
         }
         event = MockEvent(message="Any message.")
 
-        matching_channel = plugin._find_matching_channel(channels_config["channels"], event)
-        assert matching_channel == channels_config["channels"][0]
+        matching_channels = plugin._get_matching_channels(event, channels_config["channels"])
+        assert [(channel.api_token, channel.receivers) for channel in matching_channels] == [("token1", "chat1")]